@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CatalogItem, Invoice, InvoiceItem, EventTemplate, TemplateItem
+from .models import CatalogItem, Invoice, InvoiceItem, EventTemplate, TemplateItem, StockMovement
 
 @admin.register(CatalogItem)
 class CatalogItemAdmin(admin.ModelAdmin):
@@ -24,4 +24,19 @@ class InvoiceItemInline(admin.TabularInline):
 @admin.register(Invoice)
 class InvoiceAdmin(admin.ModelAdmin):
     list_display = ('id', 'status', 'total_amount', 'created_at')
-    inlines = [InvoiceItemInline]
\ No newline at end of file
+    inlines = [InvoiceItemInline]
+
+    def save_related(self, request, form, formsets, change):
+        # Строки сохраняются по одной — итоги пересчитываем один раз после всех
+        super().save_related(request, form, formsets, change)
+        invoice = form.instance
+        invoice.calculate_totals()
+        invoice.save(update_fields=['total_amount', 'tax_amount', 'updated_at'])
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'item', 'quantity', 'balance_after', 'reason', 'invoice', 'created_by')
+    list_filter = ('reason',)
+    search_fields = ('item__name', 'item__code')
+    # Журнал только для чтения: остаток меняется через billing.stock
+    readonly_fields = [f.name for f in StockMovement._meta.fields]
\ No newline at end of file
@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-19 15:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0002_catalogitem_created_by_catalogitem_is_global_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(verbose_name='Изменение остатка')),
+                ('balance_after', models.IntegerField(verbose_name='Остаток после')),
+                ('reason', models.CharField(choices=[('sale', 'Продажа (оплата счета)'), ('adjustment', 'Корректировка')], default='sale', max_length=20, verbose_name='Причина')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Кто провел')),
+                ('invoice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='billing.invoice', verbose_name='Счет')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_movements', to='billing.catalogitem', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Движение склада',
+                'verbose_name_plural': 'Журнал склада',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
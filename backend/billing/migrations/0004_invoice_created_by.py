@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-19 15:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Старые счета: автор — тот, кто создал связанное событие (иначе счет виден только клиенту)
+BACKFILL_SQL = """
+    UPDATE billing_invoice i
+    SET created_by_id = e.created_by_id
+    FROM pets_petevent e
+    WHERE e.id = i.event_id AND i.created_by_id IS NULL AND e.created_by_id IS NOT NULL
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0003_stockmovement'),
+        ('pets', '0008_petevent_next_date_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='created_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='issued_invoices', to=settings.AUTH_USER_MODEL, verbose_name='Выставил'),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['created_by', '-created_at'], name='invoice_creator_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['created_by', 'status', 'paid_at'], name='invoice_creator_paid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['client', '-created_at'], name='invoice_client_created_idx'),
+        ),
+    ]
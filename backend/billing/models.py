@@ -1,4 +1,8 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 from django.conf import settings
 from pets.models import Pet, PetEvent
 
@@ -54,6 +58,11 @@ class CatalogItem(models.Model):
     class Meta:
         verbose_name = "Товар/Услуга"
         verbose_name_plural = "Каталог услуг"
+        indexes = [
+            # Автокомплит и SearchFilter: icontains/istartswith дают UPPER(...) LIKE — триграммы по UPPER
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='catalog_name_trgm'),
+            GinIndex(OpClass(Upper('code'), name='gin_trgm_ops'), name='catalog_code_trgm'),
+        ]
 
 
 # === НОВЫЕ МОДЕЛИ ДЛЯ МАКРОСОВ (ШАБЛОНОВ) ===
@@ -92,6 +101,8 @@ class TemplateItem(models.Model):
 
 
 # === МОДЕЛИ СЧЕТОВ ===
+CENT = Decimal('0.01')
+
 class Invoice(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Черновик'),
@@ -131,6 +142,15 @@ class Invoice(models.Model):
         verbose_name="Связанное событие"
     )
 
+    # Врач, выставивший счет: по нему (и по его клинике) счета видны в списке и отчетах
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='issued_invoices',
+        verbose_name="Выставил"
+    )
+
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHODS, default='card')
     
@@ -147,15 +167,34 @@ class Invoice(models.Model):
         name = self.client.get_full_name() if self.client else (self.guest_name or "Аноним")
         return f"Чек #{self.id} - {name} ({self.total_amount})"
 
-    def calculate_totals(self):
-        items = self.items.all()
-        total = sum(item.subtotal for item in items)
-        self.total_amount = total - self.discount_amount
-        self.save(update_fields=['total_amount'])
+    def calculate_totals(self, items=None):
+        """
+        Подсчет за один проход по строкам (уже посчитанным в InvoiceItem.fill_amounts):
+        налог — по ставке каждой строки, скидка — от суммы, итого = строки + налог - скидка.
+        items можно передать заранее (создание счета) — тогда в базу не ходим и ничего не сохраняем.
+        """
+        if items is None:
+            items = self.items.all()
+        subtotal = Decimal('0')
+        tax = Decimal('0')
+        for item in items:
+            subtotal += item.subtotal
+            tax += item.subtotal * item.tax_percent_at_moment / 100
+        self.tax_amount = tax.quantize(CENT, rounding=ROUND_HALF_UP)
+        self.total_amount = max(subtotal + self.tax_amount - self.discount_amount, Decimal('0'))
+        return self.total_amount
 
     class Meta:
         verbose_name = "Счет"
         verbose_name_plural = "Счета"
+        indexes = [
+            # Список счетов врача (новые сверху)
+            models.Index(fields=['created_by', '-created_at'], name='invoice_creator_created_idx'),
+            # Отчеты: оплаченные счета врача за период
+            models.Index(fields=['created_by', 'status', 'paid_at'], name='invoice_creator_paid_idx'),
+            # Счета клиента
+            models.Index(fields=['client', '-created_at'], name='invoice_client_created_idx'),
+        ]
 
 
 class InvoiceItem(models.Model):
@@ -169,19 +208,62 @@ class InvoiceItem(models.Model):
     quantity = models.IntegerField("Количество", default=1)
     subtotal = models.DecimalField("Сумма строки", max_digits=12, decimal_places=2)
 
-    def save(self, *args, **kwargs):
+    def fill_amounts(self):
+        """Снимок цены/налога из каталога (только для новой строки) и сумма строки."""
         if not self.id:
             self.name_at_moment = self.item.name
             self.price_at_moment = self.item.price
             self.tax_percent_at_moment = self.item.tax_percent
-        
+
         self.subtotal = self.price_at_moment * self.quantity
+
+    def save(self, *args, **kwargs):
+        # Итоги счета тут не пересчитываются: это делает тот, кто меняет строки (сериализатор, админка),
+        # один раз на весь счет
+        self.fill_amounts()
         super().save(*args, **kwargs)
-        self.invoice.calculate_totals()
 
     def __str__(self):
         return f"{self.name_at_moment} x{self.quantity}"
 
     class Meta:
         verbose_name = "Позиция чека"
-        verbose_name_plural = "Позиции чека"
\ No newline at end of file
+        verbose_name_plural = "Позиции чека"
+
+class StockMovement(models.Model):
+    """
+    Журнал движения склада: каждое изменение CatalogItem.stock_quantity оставляет здесь строку.
+    quantity со знаком: продажа — минус, приход/возврат — плюс.
+    """
+    REASON_CHOICES = [
+        ('sale', 'Продажа (оплата счета)'),
+        ('adjustment', 'Корректировка'),
+    ]
+
+    item = models.ForeignKey(CatalogItem, on_delete=models.PROTECT, related_name='stock_movements', verbose_name="Товар")
+    invoice = models.ForeignKey(
+        Invoice,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='stock_movements',
+        verbose_name="Счет"
+    )
+    quantity = models.IntegerField("Изменение остатка")
+    balance_after = models.IntegerField("Остаток после")
+    reason = models.CharField("Причина", max_length=20, choices=REASON_CHOICES, default='sale')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='+',
+        verbose_name="Кто провел"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.item_id}: {self.quantity:+d} -> {self.balance_after}"
+
+    class Meta:
+        verbose_name = "Движение склада"
+        verbose_name_plural = "Журнал склада"
+        ordering = ['-created_at']
@@ -0,0 +1,202 @@
+import io
+import logging
+import posixpath
+import zipfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils.html import escape
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_RIGHT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFError, TTFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+PDF_DIR = 'invoices'
+FONT_NAME = 'InvoiceFont'
+ZIP_BLOCK_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+_font = None
+
+
+def get_font():
+    """
+    TTF с кириллицей (названия услуг и имена клиентов бывают на русском).
+    Нет файла шрифта — встроенный Helvetica (только латиница).
+    """
+    global _font
+    if _font is None:
+        try:
+            pdfmetrics.registerFont(TTFont(FONT_NAME, settings.INVOICE_PDF_FONT))
+            _font = FONT_NAME
+        except (OSError, TTFError) as e:
+            # Helvetica без кириллицы: русские названия и имена в PDF пропадут
+            logger.warning("Invoice PDF font %s not loaded (%s), falling back to Helvetica", settings.INVOICE_PDF_FONT, e)
+            _font = 'Helvetica'
+    return _font
+
+
+def invoice_pdf_path(invoice):
+    """Версия файла = updated_at: изменился счет — другой путь, старый файл больше не отдается."""
+    return posixpath.join(PDF_DIR, str(invoice.id), f"invoice-{invoice.id}-{invoice.updated_at:%Y%m%d%H%M%S%f}.pdf")
+
+
+def client_name(invoice):
+    if invoice.client:
+        return invoice.client.get_full_name() or invoice.client.email
+    if invoice.pet and invoice.pet.owner:
+        return invoice.pet.owner.get_full_name() or invoice.pet.owner.email
+    if invoice.pet and invoice.pet.temp_owner_name:
+        return invoice.pet.temp_owner_name
+    return invoice.guest_name or "Guest"
+
+
+def render_invoice_pdf(invoice):
+    """
+    PDF счета в байтах (A4), локально через reportlab.
+    invoice — с select_related('client', 'pet__owner', 'created_by') и prefetch items.
+    """
+    font = get_font()
+    text = ParagraphStyle('invoice', fontName=font, fontSize=9, leading=12)
+    title = ParagraphStyle('invoice_title', parent=text, fontSize=18, leading=22)
+    right = ParagraphStyle('invoice_right', parent=text, alignment=TA_RIGHT)
+
+    vet = invoice.created_by
+    provider = (vet.clinic_name or vet.get_full_name() or vet.username) if vet else ""
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4,
+        leftMargin=15 * mm, rightMargin=15 * mm, topMargin=15 * mm, bottomMargin=15 * mm,
+        title=f"Invoice #{invoice.id}",
+    )
+
+    story = [
+        Paragraph("INVOICE", title),
+        Spacer(1, 4 * mm),
+        Table(
+            [
+                [Paragraph(f"<b>Provider</b><br/>{escape(provider)}", text),
+                 Paragraph(
+                     f"Number: #{invoice.id}<br/>"
+                     f"Date: {invoice.created_at:%d.%m.%Y}<br/>"
+                     f"Status: {escape(invoice.get_status_display())}",
+                     right,
+                 )],
+                [Paragraph(
+                    f"<b>Bill To</b><br/>{escape(client_name(invoice))}"
+                    + (f"<br/>Patient: {escape(invoice.pet.name)}" if invoice.pet else ""),
+                    text,
+                ), ""],
+            ],
+            colWidths=[100 * mm, 80 * mm],
+        ),
+        Spacer(1, 8 * mm),
+    ]
+
+    rows = [["Description", "Qty", "Price", "Tax %", "Total"]]
+    subtotal = 0
+    for item in invoice.items.all():
+        subtotal += item.subtotal
+        rows.append([
+            Paragraph(escape(item.name_at_moment), text),
+            str(item.quantity),
+            f"{item.price_at_moment:.2f}",
+            f"{item.tax_percent_at_moment:.2f}",
+            f"{item.subtotal:.2f}",
+        ])
+    rows += [
+        ["", "", "", "Subtotal", f"{subtotal:.2f}"],
+        ["", "", "", "Discount", f"-{invoice.discount_amount:.2f}"],
+        ["", "", "", "Tax", f"{invoice.tax_amount:.2f}"],
+        ["", "", "", "TOTAL DUE", f"{invoice.total_amount:.2f} €"],
+    ]
+
+    items_count = len(rows) - 5
+    table = Table(rows, colWidths=[95 * mm, 15 * mm, 25 * mm, 20 * mm, 25 * mm], repeatRows=1)
+    table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), font),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#F3F4F6')),
+        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.HexColor('#9CA3AF')),
+        ('LINEBELOW', (0, items_count), (-1, items_count), 0.5, colors.HexColor('#9CA3AF')),
+        ('FONTSIZE', (0, -1), (-1, -1), 11),
+    ]))
+    story.append(table)
+
+    if invoice.notes:
+        story += [Spacer(1, 8 * mm), Paragraph(escape(invoice.notes).replace('\n', '<br/>'), text)]
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def build_invoice_pdf(invoice):
+    """
+    Путь к PDF текущей версии счета; рендерит только если такой версии еще нет.
+    Старые версии того же счета удаляются.
+    """
+    path = invoice_pdf_path(invoice)
+    if default_storage.exists(path):
+        return path
+
+    saved = default_storage.save(path, ContentFile(render_invoice_pdf(invoice)))
+
+    directory = posixpath.dirname(path)
+    _, files = default_storage.listdir(directory)
+    for name in files:
+        old = posixpath.join(directory, name)
+        if old != saved:
+            default_storage.delete(old)
+    return saved
+
+
+def cached_invoice_pdf(invoice):
+    """Путь к готовому PDF текущей версии или None (тогда его надо поставить в рендер)."""
+    path = invoice_pdf_path(invoice)
+    return path if default_storage.exists(path) else None
+
+
+class _ZipChunks(io.RawIOBase):
+    """Файлоподобный приемник для ZipFile: копит записанное, генератор забирает кусками."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_invoice_zip(files):
+    """
+    Генератор zip-архива для StreamingHttpResponse: в памяти один блок PDF, а не весь архив.
+    files — пары (id счета, путь к готовому PDF); здесь ничего не рендерится.
+    PDF уже сжат — кладем без компрессии (ZIP_STORED).
+    """
+    sink = _ZipChunks()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for invoice_id, path in files:
+            with default_storage.open(path, 'rb') as pdf, \
+                    archive.open(f"invoice-{invoice_id}.pdf", mode='w', force_zip64=True) as entry:
+                for block in iter(lambda: pdf.read(ZIP_BLOCK_SIZE), b''):
+                    entry.write(block)
+                    yield sink.pop()
+    # Дескрипторы последнего файла и центральный каталог пишутся при закрытии архива
+    yield sink.pop()
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import InvoiceItem
+
+PERIODS = ('day', 'week', 'month')
+
+
+def revenue_report(invoices, period, date_from, date_to):
+    """
+    Выручка, налог, скидки и структура продаж (услуги/товары) по периодам — двумя GROUP BY в базе.
+    invoices — уже отфильтрованный по доступу queryset счетов; учитываются только оплаченные,
+    период считается по дате оплаты в TIME_ZONE проекта. date_to не включительно.
+    """
+    paid = invoices.filter(status='paid', paid_at__gte=date_from, paid_at__lt=date_to)
+
+    totals = (
+        paid
+        .annotate(period=Trunc('paid_at', period))
+        .values('period')
+        .annotate(
+            invoices=Count('id'),
+            revenue=Sum('total_amount'),
+            tax=Sum('tax_amount'),
+            discount=Sum('discount_amount'),
+        )
+        .order_by('period')
+    )
+    mix = (
+        InvoiceItem.objects
+        .filter(invoice__in=paid.values('id'))
+        .annotate(period=Trunc('invoice__paid_at', period))
+        .values('period', 'item__item_type')
+        .annotate(amount=Sum('subtotal'), quantity=Sum('quantity'))
+        .order_by('period')
+    )
+
+    rows = {}
+    for row in totals:
+        rows[row['period']] = {
+            'period': row['period'].date().isoformat(),
+            'invoices': row['invoices'],
+            'revenue': row['revenue'],
+            'tax': row['tax'],
+            'discount': row['discount'],
+            'mix': {},
+        }
+    for row in mix:
+        if row['period'] in rows:
+            rows[row['period']]['mix'][row['item__item_type']] = {
+                'amount': row['amount'],
+                'quantity': row['quantity'],
+            }
+    return list(rows.values())
+
+
+def cached_revenue_report(scope_key, invoices, period, date_from, date_to):
+    """
+    Отчет из кэша. Закрытые периоды (date_to в прошлом) уже не меняются и живут сутки,
+    текущий — BILLING_REPORT_CACHE_TTL, чтобы свежие оплаты появлялись без ручного сброса.
+    """
+    key = f"billing_report:{scope_key}:{period}:{date_from.isoformat()}:{date_to.isoformat()}"
+    report = cache.get(key)
+    if report is None:
+        report = revenue_report(invoices, period, date_from, date_to)
+        closed = date_to <= timezone.now()
+        cache.set(key, report, settings.BILLING_REPORT_CLOSED_CACHE_TTL if closed else settings.BILLING_REPORT_CACHE_TTL)
+    return report
@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Upper
+
+# Короче этого триграммы не помогают — ищем только по началу строки
+MIN_TRIGRAM_LENGTH = 3
+
+AUTOCOMPLETE_FIELDS = ('id', 'name', 'code', 'item_type', 'price', 'tax_percent', 'stock_quantity')
+
+
+def search_catalog(queryset, query, limit):
+    """
+    Подбор позиций каталога под строку ввода.
+    Точное совпадение кода (номер GOT) — сразу одним запросом по уникальному индексу.
+    Иначе — по триграммным индексам на UPPER(name)/UPPER(code) с ранжированием:
+    начало кода, начало названия, вхождение; внутри — по сходству названия.
+    """
+    exact = list(queryset.filter(code__in={query, query.upper()}).values(*AUTOCOMPLETE_FIELDS)[:1])
+
+    if len(query) < MIN_TRIGRAM_LENGTH:
+        matches = queryset.filter(Q(code__istartswith=query) | Q(name__istartswith=query))
+    else:
+        matches = queryset.filter(Q(code__icontains=query) | Q(name__icontains=query))
+
+    upper = query.upper()
+    matches = matches.annotate(
+        rank=Case(
+            When(code__istartswith=query, then=Value(0)),
+            When(name__istartswith=query, then=Value(1)),
+            default=Value(2),
+            output_field=IntegerField(),
+        ),
+        similarity=TrigramSimilarity(Upper('name'), Value(upper)),
+    ).order_by('rank', '-similarity', 'name')
+
+    if exact:
+        matches = matches.exclude(id=exact[0]['id'])
+    return exact + list(matches.values(*AUTOCOMPLETE_FIELDS)[:limit - len(exact)])
+
+
+def catalog_cache_version(user_id):
+    # Начальная версия от времени: если ключ версии вытеснили, старые ответы не подхватятся
+    return cache.get_or_set(f"catalog_version:{user_id}", int(time.time()), None)
+
+
+def invalidate_catalog_cache(user_id):
+    """Свои позиции изменились — старые ответы автокомплита этого юзера больше не используются."""
+    try:
+        cache.incr(f"catalog_version:{user_id}")
+    except ValueError:
+        catalog_cache_version(user_id)
+
+
+def cached_search_catalog(user_id, queryset, query, limit, item_type=None):
+    """Ответ автокомплита на CATALOG_AUTOCOMPLETE_CACHE_TTL: один и тот же префикс набирают постоянно."""
+    key = f"catalog_ac:{user_id}:{catalog_cache_version(user_id)}:{item_type or ''}:{limit}:{query.lower()}"
+    results = cache.get(key)
+    if results is None:
+        results = search_catalog(queryset, query, limit)
+        cache.set(key, results, settings.CATALOG_AUTOCOMPLETE_CACHE_TTL)
+    return results
@@ -1,5 +1,7 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import CatalogItem, Invoice, InvoiceItem, EventTemplate, TemplateItem
+from .stock import InsufficientStock, mark_invoice_paid
 from users.serializers import PublicProfileSerializer
 from pets.serializers import PetSerializer
 
@@ -30,8 +32,9 @@ class EventTemplateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         template = EventTemplate.objects.create(**validated_data)
-        for item_data in items_data:
-            TemplateItem.objects.create(template=template, **item_data)
+        TemplateItem.objects.bulk_create([
+            TemplateItem(template=template, **item_data) for item_data in items_data
+        ])
         return template
 
 # === INVOICES ===
@@ -101,13 +104,49 @@ class InvoiceSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         
-        invoice = Invoice.objects.create(**validated_data)
-        for item_data in items_data:
-            InvoiceItem.objects.create(invoice=invoice, **item_data)
-        invoice.calculate_totals()
+        # Строки считаем в памяти (товары уже загружены валидацией item_id),
+        # затем один INSERT счета с готовыми итогами и один bulk INSERT строк
+        items = [InvoiceItem(**item_data) for item_data in items_data]
+        for item in items:
+            item.fill_amounts()
+
+        # Счет, созданный сразу оплаченным, проходит тот же путь оплаты, что и PATCH (со списанием склада)
+        pay_now = validated_data.get('status') == 'paid'
+        if pay_now:
+            validated_data['status'] = 'unpaid'
+
+        invoice = Invoice(**validated_data)
+        invoice.calculate_totals(items)
+        with transaction.atomic():
+            invoice.save()
+            for item in items:
+                item.invoice = invoice
+            InvoiceItem.objects.bulk_create(items)
+            if pay_now:
+                self.pay(invoice, validated_data.get('payment_method'))
         return invoice
 
+    def pay(self, invoice, payment_method=None):
+        request = self.context.get('request')
+        try:
+            return mark_invoice_paid(
+                invoice,
+                user=request.user if request else None,
+                payment_method=payment_method,
+            )
+        except InsufficientStock as e:
+            raise serializers.ValidationError({"error": str(e)})
+
     def update(self, instance, validated_data):
+        # Оплата — отдельный путь: атомарный переход статуса + списание склада
+        if validated_data.get('status') == 'paid' and instance.status != 'paid':
+            if not self.pay(instance, validated_data.get('payment_method')):
+                # Счет успел оплатить параллельный запрос: берем его статус из базы,
+                # иначе save() ниже вернул бы устаревший 'unpaid' поверх оплаты
+                instance.refresh_from_db()
+            validated_data.pop('status')
+            validated_data.pop('payment_method', None)
+
         instance.status = validated_data.get('status', instance.status)
         instance.payment_method = validated_data.get('payment_method', instance.payment_method)
         instance.notes = validated_data.get('notes', instance.notes)
@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import CatalogItem, Invoice, InvoiceItem, StockMovement
+
+
+class InsufficientStock(Exception):
+    """Оплата увела бы остаток в минус (при BILLING_ALLOW_NEGATIVE_STOCK = False)."""
+
+    def __init__(self, items):
+        self.items = items
+        super().__init__("Недостаточно на складе: " + ", ".join(items))
+
+
+def mark_invoice_paid(invoice, user=None, payment_method=None):
+    """
+    Перевод счета в 'paid' со списанием склада — в одной транзакции.
+    Переход делается условным UPDATE: из двух одновременных оплат списывает только одна.
+    Возвращает False, если счет уже был оплачен; при нехватке товара — InsufficientStock (откат всего).
+    """
+    now = timezone.now()
+    fields = {'status': 'paid', 'paid_at': now, 'updated_at': now}
+    if payment_method:
+        fields['payment_method'] = payment_method
+
+    with transaction.atomic():
+        if not Invoice.objects.filter(pk=invoice.pk).exclude(status='paid').update(**fields):
+            return False
+        apply_invoice_stock(invoice, user)
+
+    for name, value in fields.items():
+        setattr(invoice, name, value)
+    return True
+
+
+def apply_invoice_stock(invoice, user=None):
+    """
+    Списание по строкам счета: на каждый товар один UPDATE stock_quantity = stock_quantity - x.
+    Блокировку строки держит сам UPDATE — параллельные оплаты того же товара встают в очередь,
+    а не перезаписывают друг друга. Товары обходим по id, чтобы два счета не взаимоблокировались.
+    """
+    quantities = (
+        InvoiceItem.objects
+        .filter(invoice=invoice, item__is_stock_tracked=True)
+        .values('item_id')
+        .annotate(total=Sum('quantity'))
+        .order_by('item_id')
+    )
+
+    movements = []
+    short = []
+    for row in quantities:
+        updated = CatalogItem.objects.filter(pk=row['item_id'])
+        if not settings.BILLING_ALLOW_NEGATIVE_STOCK:
+            updated = updated.filter(stock_quantity__gte=row['total'])
+        if not updated.update(stock_quantity=F('stock_quantity') - row['total']):
+            short.append(row['item_id'])
+            continue
+        movements.append(StockMovement(
+            item_id=row['item_id'],
+            invoice=invoice,
+            quantity=-row['total'],
+            reason='sale',
+            created_by=user,
+        ))
+
+    if short:
+        names = CatalogItem.objects.filter(pk__in=short).values_list('name', flat=True)
+        raise InsufficientStock(list(names))
+
+    if movements:
+        balances = dict(
+            CatalogItem.objects.filter(pk__in=[m.item_id for m in movements]).values_list('id', 'stock_quantity')
+        )
+        for movement in movements:
+            movement.balance_after = balances[movement.item_id]
+        StockMovement.objects.bulk_create(movements)
+    return movements
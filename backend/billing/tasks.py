@@ -0,0 +1,28 @@
+from celery import shared_task
+from django.core.cache import cache
+
+from .models import Invoice
+from .pdf import build_invoice_pdf, invoice_pdf_path
+
+
+def invoices_for_pdf():
+    return Invoice.objects.select_related('client', 'pet__owner', 'created_by').prefetch_related('items')
+
+
+@shared_task
+def render_invoice_pdf(invoice_id):
+    """
+    Фоновый рендер PDF счета (в запросе не рендерим — это держало бы Daphne).
+    Одна версия (updated_at) рендерится одним воркером, повторные постановки — no-op.
+    """
+    invoice = invoices_for_pdf().filter(pk=invoice_id).first()
+    if not invoice:
+        return None
+
+    lock = f"invoice_pdf_lock:{invoice_pdf_path(invoice)}"
+    if not cache.add(lock, 1, timeout=300):
+        return None
+    try:
+        return build_invoice_pdf(invoice)
+    finally:
+        cache.delete(lock)
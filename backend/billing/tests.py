@@ -1,3 +1,195 @@
-from django.test import TestCase
+import threading
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+
+from users.models import User
+from .models import CatalogItem, Invoice, InvoiceItem, StockMovement
+from .serializers import InvoiceSerializer
+from .stock import InsufficientStock, mark_invoice_paid
+
+
+class InvoiceCreateBenchmark(TestCase):
+    """
+    Создание счета на 100 строк: число запросов на сохранение не зависит от числа строк,
+    итоги (сумма, налог, скидка) считаются за один проход.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vet = User.objects.create(username='bench_vet')
+        CatalogItem.objects.bulk_create([
+            CatalogItem(
+                name=f"Услуга {i}",
+                code=f"BENCH-{i}",
+                price=Decimal('10.50'),
+                tax_percent=Decimal('19.00') if i % 2 else Decimal('0'),
+                created_by=cls.vet,
+            )
+            for i in range(100)
+        ])
+        cls.catalog = list(CatalogItem.objects.order_by('id'))
+
+    def build_serializer(self, lines):
+        data = {
+            'status': 'unpaid',
+            'guest_name': 'Гость',
+            'discount_amount': '5.00',
+            'items': [{'item_id': item.id, 'quantity': 2} for item in self.catalog[:lines]],
+        }
+        serializer = InvoiceSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer
+
+    def save_and_count(self, lines):
+        serializer = self.build_serializer(lines)
+        with CaptureQueriesContext(connection) as ctx:
+            invoice = serializer.save()
+        return invoice, len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_lines(self):
+        _, small_queries = self.save_and_count(10)
+        invoice, queries = self.save_and_count(100)
+
+        self.assertEqual(queries, small_queries)
+        # SAVEPOINT + INSERT счета + bulk INSERT строк + RELEASE
+        self.assertLessEqual(queries, 4)
+        self.assertEqual(invoice.items.count(), 100)
+
+    def test_totals(self):
+        invoice, _ = self.save_and_count(100)
+        invoice = Invoice.objects.get(pk=invoice.pk)
+
+        # 100 строк по 21.00; налог 19% на половине: 50 * 21.00 * 0.19 = 199.50
+        self.assertEqual(invoice.tax_amount, Decimal('199.50'))
+        self.assertEqual(invoice.total_amount, Decimal('2100.00') + Decimal('199.50') - Decimal('5.00'))
+
+        # Пересчет из базы дает то же самое
+        invoice.calculate_totals()
+        self.assertEqual(invoice.total_amount, Decimal('2294.50'))
+
+
+class StockConcurrencyTest(TransactionTestCase):
+    """
+    Несколько воркеров одновременно оплачивают счета на один и тот же товар:
+    остаток уменьшается ровно на проданное, в минус не уходит, каждое списание есть в журнале.
+    """
+    workers = 8
+
+    def setUp(self):
+        self.vet = User.objects.create(username='stock_vet')
+        self.item = CatalogItem.objects.create(
+            name="Вакцина", code="STOCK-1", item_type='good', price=Decimal('30.00'),
+            is_stock_tracked=True, stock_quantity=5,
+        )
+
+    def make_invoice(self, quantity=1):
+        invoice = Invoice.objects.create(status='unpaid', guest_name='Гость')
+        InvoiceItem.objects.create(invoice=invoice, item=self.item, quantity=quantity)
+        return invoice
+
+    def pay_concurrently(self, invoices):
+        barrier = threading.Barrier(len(invoices))
+        results = []
+
+        def worker(invoice):
+            try:
+                barrier.wait()
+                try:
+                    results.append(mark_invoice_paid(invoice, user=self.vet))
+                except InsufficientStock:
+                    results.append('short')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(invoice,)) for invoice in invoices]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_parallel_sales_never_oversell(self):
+        invoices = [self.make_invoice() for _ in range(self.workers)]
+        results = self.pay_concurrently(invoices)
+
+        self.item.refresh_from_db()
+        self.assertEqual(results.count(True), 5)
+        self.assertEqual(results.count('short'), self.workers - 5)
+        self.assertEqual(self.item.stock_quantity, 0)
+        self.assertEqual(Invoice.objects.filter(status='paid').count(), 5)
+        self.assertEqual(StockMovement.objects.filter(item=self.item).count(), 5)
+        self.assertEqual(
+            sorted(StockMovement.objects.values_list('balance_after', flat=True)), [0, 1, 2, 3, 4]
+        )
+
+    def test_same_invoice_paid_twice_decrements_once(self):
+        invoice = self.make_invoice(quantity=2)
+        results = self.pay_concurrently([Invoice.objects.get(pk=invoice.pk) for _ in range(self.workers)])
+
+        self.item.refresh_from_db()
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(self.item.stock_quantity, 3)
+        self.assertEqual(StockMovement.objects.count(), 1)
+
+    def test_parallel_patch_paid_keeps_invoice_paid(self):
+        # Проигравший PATCH не должен записать устаревший 'unpaid' поверх оплаты
+        invoice = self.make_invoice(quantity=2)
+        barrier = threading.Barrier(self.workers)
+
+        def worker():
+            try:
+                serializer = InvoiceSerializer(
+                    Invoice.objects.get(pk=invoice.pk), data={'status': 'paid'}, partial=True
+                )
+                serializer.is_valid(raise_exception=True)
+                barrier.wait()
+                serializer.save()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        invoice.refresh_from_db()
+        self.item.refresh_from_db()
+        self.assertEqual(invoice.status, 'paid')
+        self.assertIsNotNone(invoice.paid_at)
+        self.assertEqual(self.item.stock_quantity, 3)
+        self.assertEqual(StockMovement.objects.count(), 1)
+
+    def test_create_paid_decrements_stock(self):
+        data = {
+            'status': 'paid',
+            'guest_name': 'Гость',
+            'items': [{'item_id': self.item.id, 'quantity': 2}],
+        }
+        serializer = InvoiceSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        invoice = serializer.save()
+
+        self.item.refresh_from_db()
+        self.assertEqual(Invoice.objects.get(pk=invoice.pk).status, 'paid')
+        self.assertEqual(self.item.stock_quantity, 3)
+
+        data['items'] = [{'item_id': self.item.id, 'quantity': 10}]
+        serializer = InvoiceSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError):
+            serializer.save()
+        self.assertEqual(Invoice.objects.count(), 1)
+
+    @override_settings(BILLING_ALLOW_NEGATIVE_STOCK=True)
+    def test_negative_stock_allowed(self):
+        invoices = [self.make_invoice() for _ in range(self.workers)]
+        results = self.pay_concurrently(invoices)
+
+        self.item.refresh_from_db()
+        self.assertEqual(results.count(True), self.workers)
+        self.assertEqual(self.item.stock_quantity, 5 - self.workers)
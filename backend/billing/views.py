@@ -1,7 +1,24 @@
-from rest_framework import viewsets, permissions, filters
+from datetime import date, datetime, time, timedelta
+
+from rest_framework import viewsets, permissions, filters, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
-from .models import CatalogItem, Invoice, EventTemplate
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Q, Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from pets.models import Pet, PetEvent, EventType
+from pets.serializers import PetEventSerializer
+from users.models import User
+from .models import CatalogItem, Invoice, InvoiceItem, EventTemplate, TemplateItem
+from .reports import PERIODS, cached_revenue_report
+from .search import cached_search_catalog, invalidate_catalog_cache
+from .pdf import cached_invoice_pdf, stream_invoice_zip
+from .tasks import render_invoice_pdf
 from .serializers import CatalogItemSerializer, InvoiceSerializer, EventTemplateSerializer
 
 class CatalogItemViewSet(viewsets.ModelViewSet):
@@ -19,6 +36,38 @@ class CatalogItemViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user, is_global=False)
+        invalidate_catalog_cache(self.request.user.id)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        invalidate_catalog_cache(self.request.user.id)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        invalidate_catalog_cache(self.request.user.id)
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Подсказки для выбора позиции в счете (запрос на каждое нажатие).
+        GET /api/billing/catalog/autocomplete/?q=...&item_type=good&limit=10
+        Легкий ответ без пагинации: id, name, code, item_type, price, tax_percent, stock_quantity.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response([])
+
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), settings.CATALOG_AUTOCOMPLETE_LIMIT)
+        except ValueError:
+            return Response({"error": "limit должен быть числом"}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.get_queryset().order_by()
+        item_type = request.query_params.get('item_type')
+        if item_type:
+            queryset = queryset.filter(item_type=item_type)
+
+        return Response(cached_search_catalog(request.user.id, queryset, query, max(limit, 1), item_type))
 
 class EventTemplateViewSet(viewsets.ModelViewSet):
     """
@@ -29,13 +78,95 @@ class EventTemplateViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        # Строки шаблона вместе с товарами каталога — одним запросом на весь список
         return EventTemplate.objects.filter(
             Q(created_by=user) | Q(is_global=True)
+        ).prefetch_related(
+            Prefetch('items', queryset=TemplateItem.objects.select_related('item'))
         )
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    @action(detail=True, methods=['post'])
+    def apply(self, request, pk=None):
+        """
+        Применить макрос: событие с текстом шаблона + черновик счета со всеми услугами шаблона.
+        POST /api/billing/templates/{id}/apply/
+        {"pet": 1, "event_type_id": 2, "date": "...", "title": "..."} — date и title необязательны.
+        Число запросов не зависит от числа строк шаблона: цены снимаются из уже загруженного каталога,
+        строки счета вставляются одним bulk INSERT.
+        """
+        template = self.get_object()
+        user = request.user
+
+        pet_id = request.data.get('pet')
+        event_type_id = request.data.get('event_type_id')
+        if not pet_id or not event_type_id:
+            return Response({"error": "Нужны pet и event_type_id"}, status=status.HTTP_400_BAD_REQUEST)
+        if not str(pet_id).isdigit() or not str(event_type_id).isdigit():
+            return Response({"error": "pet и event_type_id должны быть числами"}, status=status.HTTP_400_BAD_REQUEST)
+
+        pet = Pet.objects.filter(
+            Q(owner=user) | Q(access_grants__user=user, access_grants__is_active=True),
+            pk=pet_id
+        ).select_related('owner').first()
+        if not pet:
+            return Response({"error": "Питомец не найден или нет доступа"}, status=status.HTTP_404_NOT_FOUND)
+
+        # Те же типы, что видит пользователь в EventTypeViewSet: системные + свои
+        event_type = EventType.objects.filter(
+            Q(created_by__isnull=True) | Q(created_by=user),
+            pk=event_type_id
+        ).first()
+        if not event_type:
+            return Response({"error": "Тип события не найден"}, status=status.HTTP_400_BAD_REQUEST)
+
+        date = timezone.now()
+        if request.data.get('date'):
+            date = parse_datetime(str(request.data['date']))
+            if date is None:
+                return Response({"error": "Неверный формат даты"}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(date):
+                date = timezone.make_aware(date)
+
+        # template.items уже в кэше prefetch (get_queryset) — здесь запросов нет
+        items = [
+            InvoiceItem(item=template_item.item, quantity=template_item.quantity)
+            for template_item in template.items.all()
+        ]
+        for item in items:
+            item.fill_amounts()
+
+        with transaction.atomic():
+            event = PetEvent.objects.create(
+                pet=pet,
+                event_type=event_type,
+                title=request.data.get('title') or template.name,
+                description=template.description_template,
+                date=date,
+                status='completed' if date <= timezone.now() else 'planned',
+                created_by=user,
+            )
+            invoice = Invoice(
+                client=pet.owner,
+                guest_name=None if pet.owner else pet.temp_owner_name,
+                pet=pet,
+                event=event,
+                status='draft',
+                created_by=user,
+            )
+            invoice.calculate_totals(items)
+            invoice.save()
+            for item in items:
+                item.invoice = invoice
+            InvoiceItem.objects.bulk_create(items)
+
+        return Response({
+            "event": PetEventSerializer(event, context=self.get_serializer_context()).data,
+            "invoice": InvoiceSerializer(invoice, context=self.get_serializer_context()).data,
+        }, status=status.HTTP_201_CREATED)
+
 class InvoiceViewSet(viewsets.ModelViewSet):
     serializer_class = InvoiceSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -44,4 +175,116 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at', 'total_amount']
 
     def get_queryset(self):
-        return Invoice.objects.all().select_related('client', 'pet').prefetch_related('items')
\ No newline at end of file
+        # pet__owner — для client_info, иначе по запросу на строку
+        return Invoice.objects.filter(self.get_scope()).select_related(
+            'client', 'pet__owner'
+        ).prefetch_related('items')
+
+    def get_scope(self):
+        """
+        Врач видит свои счета и счета коллег по клинике, клиент — выставленные ему.
+        Коллеги — только верифицированные врачи с тем же clinic_name, и сам врач тоже верифицирован:
+        is_verified ставит модерация, а clinic_name после верификации через API не меняется.
+        """
+        user = self.request.user
+        scope = Q(created_by=user) | Q(client=user)
+        if user.is_veterinarian and user.is_verified and user.clinic_name:
+            scope |= Q(created_by__in=User.objects.filter(
+                is_veterinarian=True, is_verified=True, clinic_name=user.clinic_name
+            ).values('id'))
+        return scope
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+    @action(detail=True, methods=['get'])
+    def pdf(self, request, pk=None):
+        """
+        PDF счета. Готов для текущей версии — отдаем файл,
+        иначе ставим рендер в Celery и отвечаем 202: клиент повторяет запрос.
+        """
+        invoice = self.get_object()
+        path = cached_invoice_pdf(invoice)
+        if path:
+            return FileResponse(default_storage.open(path, 'rb'), as_attachment=True, filename=f"invoice-{invoice.id}.pdf")
+
+        render_invoice_pdf.delay(invoice.id)
+        return Response({"status": "processing"}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Zip с PDF всех доступных счетов за период (по дате создания), отдается потоком.
+        GET /api/billing/invoices/export/?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD
+        В архив идут только готовые PDF из кэша. Если каких-то нет — ставим их рендер в Celery
+        и отвечаем 202, как pdf: клиент повторяет запрос.
+        """
+        try:
+            date_from = date.fromisoformat(request.query_params.get('date_from', ''))
+            date_to = date.fromisoformat(request.query_params.get('date_to', ''))
+        except ValueError:
+            return Response({"error": "Нужны date_from и date_to (YYYY-MM-DD)"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Для пути к PDF нужны только id и версия (updated_at)
+        invoices = Invoice.objects.filter(
+            self.get_scope(),
+            created_at__gte=timezone.make_aware(datetime.combine(date_from, time.min)),
+            created_at__lt=timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min)),
+        ).only('id', 'updated_at').order_by('id')
+        if invoices.count() > settings.INVOICE_EXPORT_MAX_INVOICES:
+            return Response(
+                {"error": f"Слишком много счетов, максимум {settings.INVOICE_EXPORT_MAX_INVOICES} — сузьте период"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        files, missing = [], []
+        for invoice in invoices:
+            path = cached_invoice_pdf(invoice)
+            if path:
+                files.append((invoice.id, path))
+            else:
+                missing.append(invoice.id)
+
+        if missing:
+            for invoice_id in missing:
+                render_invoice_pdf.delay(invoice_id)
+            return Response({"status": "processing", "missing": len(missing)}, status=status.HTTP_202_ACCEPTED)
+
+        response = StreamingHttpResponse(stream_invoice_zip(files), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="invoices-{date_from}-{date_to}.zip"'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def report(self, request):
+        """
+        Сводка по оплаченным счетам: выручка, налог, скидки и доля услуг/товаров.
+        GET /api/billing/invoices/report/?period=day|week|month&date_from=YYYY-MM-DD&date_to=YYYY-MM-DD
+        По умолчанию — последние 30 дней / 12 недель / 12 месяцев, date_to включительно.
+        """
+        period = request.query_params.get('period', 'day')
+        if period not in PERIODS:
+            return Response({"error": "period: day, week или month"}, status=status.HTTP_400_BAD_REQUEST)
+
+        date_to = timezone.localdate()
+        date_from = date_to - timedelta(days={'day': 30, 'week': 7 * 12, 'month': 365}[period])
+        try:
+            if request.query_params.get('date_from'):
+                date_from = date.fromisoformat(request.query_params['date_from'])
+            if request.query_params.get('date_to'):
+                date_to = date.fromisoformat(request.query_params['date_to'])
+        except ValueError:
+            return Response({"error": "Неверный формат даты"}, status=status.HTTP_400_BAD_REQUEST)
+        if date_from > date_to:
+            return Response({"error": "date_from позже date_to"}, status=status.HTTP_400_BAD_REQUEST)
+
+        start = timezone.make_aware(datetime.combine(date_from, time.min))
+        end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+        rows = cached_revenue_report(
+            f"user:{request.user.id}", Invoice.objects.filter(self.get_scope()), period, start, end
+        )
+        return Response({
+            "period": period,
+            "date_from": date_from,
+            "date_to": date_to,
+            "results": rows,
+        })
\ No newline at end of file
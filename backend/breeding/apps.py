@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class BreedingConfig(AppConfig):
     name = 'breeding'
+
+    def ready(self):
+        import breeding.signals # Сброс кэша прогнозов течек и сводки питомника
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Q, Sum
+
+from .models import Litter, Mating
+
+
+def cache_key(owner_id):
+    return f"breeding_dashboard:{owner_id}"
+
+
+def invalidate_dashboard(owner_id):
+    cache.delete(cache_key(owner_id))
+
+
+def _rate(part, total):
+    return round(part / total, 4) if total else None
+
+
+def build_dashboard(owner_id):
+    """
+    Сводка питомника четырьмя GROUP BY-запросами: пометы и вязки в целом и по каждому производителю.
+    Пометы — по Litter.owner, вязки — по владельцу матери (как в LitterViewSet/MatingViewSet).
+    """
+    litters = Litter.objects.filter(owner_id=owner_id)
+    matings = Mating.objects.filter(dam__owner_id=owner_id)
+    litter_stats = dict(
+        litter_count=Count('id'),
+        alive=Sum('born_alive', default=0),
+        dead=Sum('born_dead', default=0),
+        avg_size=Avg(F('born_alive') + F('born_dead')),
+    )
+    mating_stats = dict(
+        mating_count=Count('id'),
+        successful=Count('id', filter=Q(is_successful=True)),
+    )
+    empty = {'litter_count': 0, 'alive': 0, 'dead': 0, 'avg_size': None, 'mating_count': 0, 'successful': 0}
+
+    totals = {**empty, **litters.aggregate(**litter_stats), **matings.aggregate(**mating_stats)}
+
+    sires = {}
+    for row in litters.values('sire_id', 'sire__name').annotate(**litter_stats):
+        sires[row['sire_id']] = {**empty, **row}
+    for row in matings.values('sire_id', 'sire__name').annotate(**mating_stats):
+        sires.setdefault(row['sire_id'], {**empty, **row}).update(row)
+
+    return {
+        'totals': _summary(totals),
+        'sires': sorted(
+            ({'sire_id': s['sire_id'], 'sire_name': s['sire__name'], **_summary(s)} for s in sires.values()),
+            key=lambda s: (-s['litters'], -s['matings'], s['sire_name']),
+        ),
+    }
+
+
+def _summary(stats):
+    return {
+        'litters': stats['litter_count'],
+        'born_alive': stats['alive'],
+        'born_dead': stats['dead'],
+        'avg_litter_size': round(stats['avg_size'], 2) if stats['avg_size'] is not None else None,
+        'survival_rate': _rate(stats['alive'], stats['alive'] + stats['dead']),
+        'matings': stats['mating_count'],
+        'successful_matings': stats['successful'],
+        'mating_success_rate': _rate(stats['successful'], stats['mating_count']),
+    }
+
+
+def kennel_dashboard(owner_id):
+    """Сводка из кэша; сбрасывается сигналами при записи Litter/Mating."""
+    dashboard = cache.get(cache_key(owner_id))
+    if dashboard is None:
+        dashboard = build_dashboard(owner_id)
+        cache.set(cache_key(owner_id), dashboard, settings.BREEDING_DASHBOARD_CACHE_TTL)
+    return dashboard
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 15:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('breeding', '0001_initial'),
+        ('pets', '0008_petevent_next_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='heatcycle',
+            index=models.Index(fields=['pet', 'start_date'], name='heatcycle_pet_start_idx'),
+        ),
+    ]
@@ -23,6 +23,10 @@ class HeatCycle(models.Model):
         ordering = ['-start_date']
         verbose_name = "Цикл (Течка)"
         verbose_name_plural = "Циклы (Течки)"
+        indexes = [
+            # История циклов самки по порядку — для прогноза (оконные функции по pet_id)
+            models.Index(fields=['pet', 'start_date'], name='heatcycle_pet_start_idx'),
+        ]
 
     def __str__(self):
         return f"{self.pet.name} ({self.start_date})"
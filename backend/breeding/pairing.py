@@ -0,0 +1,234 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+# Пул кобелей/котов одной породы (категория без подкатегорий) со всем, что нужно для оценки:
+# возраст, атрибуты (pivot по slug), история вязок. Один запрос на породу, результат — в кэше.
+SIRE_POOL_SQL = """
+    SELECT
+        p.id,
+        p.name,
+        p.owner_id,
+        p.is_public,
+        p.birth_date,
+        MAX(a.value) FILTER (WHERE attr.slug = 'pedigree_number') AS pedigree_number,
+        MAX(a.value) FILTER (WHERE attr.slug = 'coat_type') AS coat_type,
+        m.last_mating,
+        COALESCE(m.successful, 0) AS successful_matings
+    FROM pets_pet p
+    JOIN pets_pet_categories pc ON pc.pet_id = p.id AND pc.category_id = %(category_id)s
+    LEFT JOIN pets_petattribute a ON a.pet_id = p.id
+    LEFT JOIN pets_attribute attr ON attr.id = a.attribute_id
+        AND attr.slug IN ('pedigree_number', 'coat_type')
+    LEFT JOIN (
+        SELECT sire_id, MAX(date) AS last_mating, COUNT(*) FILTER (WHERE is_successful) AS successful
+        FROM breeding_mating
+        GROUP BY sire_id
+    ) m ON m.sire_id = p.id
+    WHERE p.gender = 'M' AND p.is_active
+    GROUP BY p.id, m.last_mating, m.successful
+"""
+
+# Родословные в пределах PAIRING_COI_GENERATIONS поколений от каждого стартового животного:
+# (старт, особь, отец, мать). У предков на последнем поколении родители не раскрываются.
+PEDIGREE_SQL = """
+    WITH RECURSIVE up (start_id, id, depth) AS (
+        SELECT s, s, 0 FROM unnest(%(start_ids)s::bigint[]) AS s
+        UNION
+        SELECT up.start_id, parent.id, up.depth + 1
+        FROM up
+        JOIN pets_pet p ON p.id = up.id
+        CROSS JOIN LATERAL (VALUES (p.mother_id), (p.father_id)) AS parent (id)
+        WHERE parent.id IS NOT NULL AND up.depth < %(generations)s
+    )
+    SELECT DISTINCT up.start_id, p.id, p.father_id, p.mother_id
+    FROM up
+    JOIN pets_pet p ON p.id = up.id
+    WHERE up.depth < %(generations)s
+"""
+
+# Вниз от предков суки: какие кандидаты им родня в пределах тех же поколений.
+# Только эти кандидаты могут получить ненулевой COI — остальные пул не трогают.
+RELATED_CANDIDATES_SQL = """
+    WITH RECURSIVE down (id, depth) AS (
+        SELECT a, 0 FROM unnest(%(ancestor_ids)s::bigint[]) AS a
+        UNION
+        SELECT child.id, down.depth + 1
+        FROM down
+        CROSS JOIN LATERAL (
+            SELECT id FROM pets_pet WHERE mother_id = down.id
+            UNION ALL
+            SELECT id FROM pets_pet WHERE father_id = down.id
+        ) AS child
+        WHERE down.depth < %(generations)s
+    )
+    SELECT DISTINCT id FROM down WHERE id = ANY(%(candidate_ids)s::bigint[])
+"""
+
+# Порода суки: ее категории без подкатегорий (у "Собаки" есть дети, у "Бигль" — нет)
+DAM_BREEDS_SQL = """
+    SELECT pc.category_id
+    FROM pets_pet_categories pc
+    WHERE pc.pet_id = %(dam_id)s
+      AND NOT EXISTS (SELECT 1 FROM pets_category c WHERE c.parent_id = pc.category_id)
+"""
+
+
+def sire_pool(category_id):
+    """Пул кандидатов породы; пересчитывается раз в PAIRING_POOL_CACHE_TTL."""
+    key = f"pairing_pool:{category_id}"
+    pool = cache.get(key)
+    if pool is None:
+        with connection.cursor() as cursor:
+            cursor.execute(SIRE_POOL_SQL, {'category_id': category_id})
+            columns = [col[0] for col in cursor.description]
+            pool = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        cache.set(key, pool, settings.PAIRING_POOL_CACHE_TTL)
+    return pool
+
+
+def kinship(a, b, parents):
+    """
+    Коэффициент родства (kinship) f(a, b) по родословной parents = {особь: (отец, мать)}.
+    COI потомка пары = f(отец, мать). Рекурсия всегда раскрывает более позднее поколение,
+    поэтому предок не раскладывается через своих потомков и пути через общих предков
+    не пересекаются (классический COI по Райту, с учетом F самих общих предков).
+    """
+    generation = {}
+
+    def gen(x):
+        # Номер поколения: основатели (родители неизвестны или за горизонтом) — 0
+        if x not in generation:
+            father, mother = parents.get(x, (None, None))
+            generation[x] = 1 + max(gen(father) if father else -1, gen(mother) if mother else -1)
+        return generation[x]
+
+    memo = {}
+
+    def f(x, y):
+        if x is None or y is None:
+            return 0.0
+        key = (x, y) if x <= y else (y, x)
+        if key not in memo:
+            if x == y:
+                father, mother = parents.get(x, (None, None))
+                memo[key] = 0.5 * (1 + f(father, mother))
+            else:
+                if gen(x) > gen(y):
+                    x, y = y, x
+                father, mother = parents.get(y, (None, None))
+                memo[key] = 0.5 * (f(x, father) + f(x, mother))
+        return memo[key]
+
+    return f(a, b)
+
+
+def _pedigrees(cursor, start_ids, generations):
+    cursor.execute(PEDIGREE_SQL, {'start_ids': list(start_ids), 'generations': generations})
+    pedigrees = {}
+    for start_id, pet_id, father_id, mother_id in cursor.fetchall():
+        pedigrees.setdefault(start_id, {})[pet_id] = (father_id, mother_id)
+    return pedigrees
+
+
+def coefficients_of_inbreeding(dam_id, candidate_ids):
+    """
+    COI будущего потомства для всех кандидатов сразу (тремя запросами, не по паре):
+    родословная суки, отбор кандидатов, родственных ее предкам, и их родословные.
+    Для каждой пары — коэффициент родства по объединенной родословной в пределах
+    PAIRING_COI_GENERATIONS поколений от суки и от кандидата.
+    Возвращает {candidate_id: coi}; отсутствующие — неродственные (0).
+    """
+    generations = settings.PAIRING_COI_GENERATIONS
+    if not candidate_ids:
+        return {}
+    with connection.cursor() as cursor:
+        dam_pedigree = _pedigrees(cursor, [dam_id], generations).get(dam_id, {})
+        ancestor_ids = {dam_id}
+        for father_id, mother_id in dam_pedigree.values():
+            ancestor_ids.update(pid for pid in (father_id, mother_id) if pid)
+
+        cursor.execute(RELATED_CANDIDATES_SQL, {
+            'ancestor_ids': list(ancestor_ids),
+            'candidate_ids': list(candidate_ids),
+            'generations': generations,
+        })
+        related = [row[0] for row in cursor.fetchall()]
+        if not related:
+            return {}
+        pedigrees = _pedigrees(cursor, related, generations)
+
+    coi = {}
+    for candidate_id in related:
+        value = kinship(dam_id, candidate_id, {**dam_pedigree, **pedigrees.get(candidate_id, {})})
+        if value:
+            coi[candidate_id] = value
+    return coi
+
+
+def suggest_sires(dam, user, limit):
+    """
+    Рейтинг кобелей для суки. Жесткие фильтры: та же порода, возраст в окне, COI не выше
+    PAIRING_MAX_COI, без вязки за последние PAIRING_REST_DAYS. Видны свои и публичные.
+    Оценка (0..1): низкий COI — 0.5, проверенный производитель — 0.2, тот же тип шерсти — 0.15,
+    есть номер родословной — 0.15.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(DAM_BREEDS_SQL, {'dam_id': dam.id})
+        breed_ids = [row[0] for row in cursor.fetchall()]
+    if not breed_ids:
+        return None
+
+    today = timezone.localdate()
+    youngest = today - timedelta(days=30 * settings.PAIRING_SIRE_MIN_AGE_MONTHS)
+    oldest = today - timedelta(days=365 * settings.PAIRING_SIRE_MAX_AGE_YEARS)
+    rested = today - timedelta(days=settings.PAIRING_REST_DAYS)
+
+    candidates = {}
+    for breed_id in breed_ids:
+        for sire in sire_pool(breed_id):
+            if sire['id'] == dam.id or not (sire['is_public'] or sire['owner_id'] == user.id):
+                continue
+            if sire['birth_date'] and not (oldest <= sire['birth_date'] <= youngest):
+                continue
+            if sire['last_mating'] and sire['last_mating'] > rested:
+                continue
+            candidates[sire['id']] = sire
+
+    coi = coefficients_of_inbreeding(dam.id, candidates)
+    dam_attributes = dict(
+        dam.attributes.filter(attribute__slug__in=['coat_type', 'pedigree_number'])
+        .values_list('attribute__slug', 'value')
+    )
+    max_coi = settings.PAIRING_MAX_COI
+
+    ranked = []
+    for sire_id, sire in candidates.items():
+        sire_coi = coi.get(sire_id, 0)
+        if sire_coi > max_coi:
+            continue
+        same_coat = bool(sire['coat_type']) and sire['coat_type'] == dam_attributes.get('coat_type')
+        score = (
+            0.5 * (1 - sire_coi / max_coi if max_coi else 1)
+            + 0.2 * (sire['successful_matings'] > 0)
+            + 0.15 * same_coat
+            + 0.15 * bool(sire['pedigree_number'])
+        )
+        ranked.append({
+            'sire_id': sire_id,
+            'name': sire['name'],
+            'owner_id': sire['owner_id'],
+            'birth_date': sire['birth_date'],
+            'coi': round(sire_coi, 4),
+            'successful_matings': sire['successful_matings'],
+            'last_mating': sire['last_mating'],
+            'coat_type': sire['coat_type'],
+            'pedigree_number': sire['pedigree_number'],
+            'score': round(score, 4),
+        })
+
+    ranked.sort(key=lambda s: (-s['score'], s['coi'], s['name']))
+    return ranked[:limit]
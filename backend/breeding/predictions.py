@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+# Все самки заводчика за один запрос: по каждой — последняя течка, число циклов,
+# средний интервал и разброс по последним HEAT_PREDICTION_WINDOW интервалам (оконные функции).
+HEAT_STATS_SQL = """
+    WITH gaps AS (
+        SELECT
+            c.pet_id,
+            c.start_date,
+            c.start_date - LAG(c.start_date) OVER w AS gap,
+            ROW_NUMBER() OVER (PARTITION BY c.pet_id ORDER BY c.start_date DESC) AS recency
+        FROM breeding_heatcycle c
+        JOIN pets_pet p ON p.id = c.pet_id
+        WHERE p.owner_id = %(owner_id)s AND p.gender = 'F'
+        WINDOW w AS (PARTITION BY c.pet_id ORDER BY c.start_date)
+    )
+    SELECT
+        p.id,
+        p.name,
+        MAX(g.start_date),
+        COUNT(g.start_date),
+        AVG(g.gap) FILTER (WHERE g.recency <= %(window)s),
+        STDDEV_SAMP(g.gap) FILTER (WHERE g.recency <= %(window)s)
+    FROM pets_pet p
+    LEFT JOIN gaps g ON g.pet_id = p.id
+    WHERE p.owner_id = %(owner_id)s AND p.gender = 'F' AND p.is_active
+    GROUP BY p.id, p.name
+    ORDER BY p.name
+"""
+
+
+def cache_key(owner_id):
+    return f"heat_predictions:{owner_id}"
+
+
+def heat_stats(owner_id):
+    """Статистика циклов по всем самкам заводчика; в кэше, пока не залогируют новый цикл."""
+    stats = cache.get(cache_key(owner_id))
+    if stats is None:
+        with connection.cursor() as cursor:
+            cursor.execute(HEAT_STATS_SQL, {'owner_id': owner_id, 'window': settings.HEAT_PREDICTION_WINDOW})
+            stats = cursor.fetchall()
+        cache.set(cache_key(owner_id), stats, settings.HEAT_PREDICTION_CACHE_TTL)
+    return stats
+
+
+def invalidate_heat_predictions(owner_id):
+    cache.delete(cache_key(owner_id))
+
+
+def predict_heats(owner_id):
+    """
+    Ожидаемая следующая течка = последняя + средний интервал (один цикл в истории —
+    HEAT_CYCLE_DEFAULT_DAYS). Окно ± разброс интервалов. Относительные поля
+    (сколько дней осталось, просрочено ли) считаются на момент запроса, не из кэша.
+    """
+    today = timezone.localdate()
+    predictions = []
+    for pet_id, name, last_start, cycles, avg_gap, spread in heat_stats(owner_id):
+        prediction = {
+            'pet_id': pet_id,
+            'pet_name': name,
+            'cycles_logged': cycles,
+            'last_start': last_start,
+            'interval_days': None,
+            'expected_start': None,
+            'window_start': None,
+            'window_end': None,
+            'days_until': None,
+            'is_overdue': False,
+        }
+        if last_start:
+            interval = round(avg_gap) if avg_gap is not None else settings.HEAT_CYCLE_DEFAULT_DAYS
+            margin = round(spread) if spread is not None else 0
+            expected = last_start + timedelta(days=interval)
+            prediction.update({
+                'interval_days': interval,
+                'expected_start': expected,
+                'window_start': expected - timedelta(days=margin),
+                'window_end': expected + timedelta(days=margin),
+                'days_until': (expected - today).days,
+                'is_overdue': expected + timedelta(days=margin) < today,
+            })
+        predictions.append(prediction)
+    return predictions
@@ -3,12 +3,31 @@ from .models import HeatCycle, Mating, Litter
 from pets.models import Pet
 from pets.serializers import PetSerializer
 
-class HeatCycleSerializer(serializers.ModelSerializer):
+class BreedingPetsMixin:
+    """
+    Проверка питомцев в записях разведения: самка — только своя,
+    кобель — свой или публичный (чужого производителя берут по открытой карточке).
+    """
+
+    def own_female(self, pet):
+        if pet.owner_id != self.context['request'].user.id:
+            raise serializers.ValidationError("Можно указать только своего питомца")
+        return pet
+
+    def validate_sire(self, sire):
+        if sire.owner_id != self.context['request'].user.id and not sire.is_public:
+            raise serializers.ValidationError("Кобель должен быть вашим или с публичным профилем")
+        return sire
+
+class HeatCycleSerializer(BreedingPetsMixin, serializers.ModelSerializer):
     class Meta:
         model = HeatCycle
         fields = '__all__'
 
-class MatingSerializer(serializers.ModelSerializer):
+    def validate_pet(self, pet):
+        return self.own_female(pet)
+
+class MatingSerializer(BreedingPetsMixin, serializers.ModelSerializer):
     dam_name = serializers.ReadOnlyField(source='dam.name')
     sire_name = serializers.ReadOnlyField(source='sire.name')
 
@@ -16,7 +35,17 @@ class MatingSerializer(serializers.ModelSerializer):
         model = Mating
         fields = ['id', 'dam', 'dam_name', 'sire', 'sire_name', 'date', 'is_successful', 'cycle']
 
-class LitterSerializer(serializers.ModelSerializer):
+    def validate_dam(self, dam):
+        return self.own_female(dam)
+
+    def validate(self, attrs):
+        dam = attrs.get('dam', getattr(self.instance, 'dam', None))
+        cycle = attrs.get('cycle')
+        if cycle and cycle.pet_id != dam.id:
+            raise serializers.ValidationError({"cycle": "Цикл другой самки"})
+        return attrs
+
+class LitterSerializer(BreedingPetsMixin, serializers.ModelSerializer):
     dam_name = serializers.ReadOnlyField(source='dam.name')
     sire_name = serializers.ReadOnlyField(source='sire.name')
     
@@ -32,7 +61,11 @@ class LitterSerializer(serializers.ModelSerializer):
             'born_alive', 'born_dead', 
             'offspring', 'offspring_info'
         ]
-        read_only_fields = ['owner']
+        # Дети привязываются только через generate_offspring — чужие карточки сюда не попадут
+        read_only_fields = ['owner', 'offspring']
+
+    def validate_dam(self, dam):
+        return self.own_female(dam)
 
     def get_offspring_info(self, obj):
         # Возвращаем ID и Имена детей для списка
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from pets.models import Pet
+from .dashboard import invalidate_dashboard
+from .models import HeatCycle, Litter, Mating
+from .predictions import invalidate_heat_predictions
+
+
+@receiver(post_save, sender=HeatCycle)
+@receiver(post_delete, sender=HeatCycle)
+def reset_heat_predictions(sender, instance, **kwargs):
+    """Новый/исправленный цикл меняет прогноз — сбрасываем кэш заводчика."""
+    owner_id = Pet.objects.filter(pk=instance.pet_id).values_list('owner_id', flat=True).first()
+    if owner_id:
+        invalidate_heat_predictions(owner_id)
+
+
+@receiver(post_save, sender=Litter)
+@receiver(post_delete, sender=Litter)
+def reset_dashboard_on_litter(sender, instance, **kwargs):
+    invalidate_dashboard(instance.owner_id)
+
+
+@receiver(post_save, sender=Mating)
+@receiver(post_delete, sender=Mating)
+def reset_dashboard_on_mating(sender, instance, **kwargs):
+    # Вязки в сводке — по владельцу матери
+    owner_id = Pet.objects.filter(pk=instance.dam_id).values_list('owner_id', flat=True).first()
+    if owner_id:
+        invalidate_dashboard(owner_id)
@@ -1,3 +1,59 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from pets.models import Pet
+from users.models import User
+from .pairing import coefficients_of_inbreeding, kinship
+
+
+@override_settings(PAIRING_COI_GENERATIONS=5)
+class CoefficientOfInbreedingTest(TestCase):
+    """COI потомка по Райту: пути через общих предков не должны пересекаться."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create(username='breeder')
+
+    def pet(self, name, gender, father=None, mother=None):
+        return Pet.objects.create(name=name, gender=gender, owner=self.owner, father=father, mother=mother)
+
+    def coi(self, dam, sire):
+        return coefficients_of_inbreeding(dam.id, [sire.id]).get(sire.id, 0)
+
+    def test_half_siblings_with_known_grandparents(self):
+        # У общего отца есть записанные родители — раньше их пути считались дважды (0.1875)
+        grandsire = self.pet('Дед', 'M')
+        granddam = self.pet('Бабка', 'F')
+        father = self.pet('Отец', 'M', father=grandsire, mother=granddam)
+        dam = self.pet('Сука', 'F', father=father, mother=self.pet('Мать 1', 'F'))
+        sire = self.pet('Кобель', 'M', father=father, mother=self.pet('Мать 2', 'F'))
+
+        self.assertAlmostEqual(self.coi(dam, sire), 0.125)
+
+    def test_first_cousins(self):
+        grandsire = self.pet('Дед', 'M')
+        granddam = self.pet('Бабка', 'F')
+        brother = self.pet('Брат', 'M', father=grandsire, mother=granddam)
+        sister = self.pet('Сестра', 'F', father=grandsire, mother=granddam)
+        dam = self.pet('Сука', 'F', father=brother, mother=self.pet('Мать', 'F'))
+        sire = self.pet('Кобель', 'M', father=self.pet('Отец', 'M'), mother=sister)
+
+        self.assertAlmostEqual(self.coi(dam, sire), 0.0625)
+
+    def test_father_daughter_and_unrelated(self):
+        father = self.pet('Отец', 'M')
+        dam = self.pet('Дочь', 'F', father=father, mother=self.pet('Мать', 'F'))
+        stranger = self.pet('Чужой', 'M')
+
+        self.assertEqual(
+            coefficients_of_inbreeding(dam.id, [father.id, stranger.id]),
+            {father.id: 0.25},
+        )
+
+    def test_inbred_common_ancestor(self):
+        # Общий предок сам инбредный (F = 0.25): вклад умножается на (1 + F)
+        parents = {
+            'A': ('X', 'Y'), 'B': ('X', 'Y'),  # полнородные брат и сестра
+            'C': ('A', 'B'),                   # их потомок, F(C) = 0.25
+            'D': ('C', None), 'S': ('C', None),  # полусибсы через C
+        }
+        self.assertAlmostEqual(kinship('D', 'S', parents), 0.25 * 1.25 * 0.5)
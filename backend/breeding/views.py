@@ -1,9 +1,14 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Prefetch
 
 from .models import HeatCycle, Mating, Litter
+from .dashboard import kennel_dashboard
+from .pairing import suggest_sires
+from .predictions import predict_heats
 from .serializers import HeatCycleSerializer, MatingSerializer, LitterSerializer
 from pets.models import Pet
 
@@ -26,21 +31,62 @@ class HeatCycleViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated, BreedingPermission]
 
     def get_queryset(self):
-        return HeatCycle.objects.filter(pet__owner=self.request.user)
+        return HeatCycle.objects.filter(pet__owner=self.request.user).select_related('pet')
+
+    @action(detail=False, methods=['get'])
+    def predictions(self, request):
+        """
+        Прогноз следующей течки по всем самкам заводчика.
+        GET /api/breeding/cycles/predictions/
+        Считается одним запросом по истории HeatCycle, хранится в кэше до нового цикла.
+        """
+        return Response(predict_heats(request.user.id))
 
 class MatingViewSet(viewsets.ModelViewSet):
     serializer_class = MatingSerializer
     permission_classes = [permissions.IsAuthenticated, BreedingPermission]
 
     def get_queryset(self):
-        return Mating.objects.filter(dam__owner=self.request.user)
+        return Mating.objects.filter(dam__owner=self.request.user).select_related('dam', 'sire')
+
+    @action(detail=False, methods=['get'])
+    def suggestions(self, request):
+        """
+        Подбор кобеля для суки: топ кандидатов той же породы по совместимости.
+        GET /api/breeding/matings/suggestions/?dam=<id>&limit=10
+        """
+        dam_id = request.query_params.get('dam', '')
+        dam = dam_id.isdigit() and Pet.objects.filter(pk=dam_id, owner=request.user, gender='F').first()
+        if not dam:
+            return Response({"error": "Сука не найдена"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            limit = min(int(request.query_params.get('limit', settings.PAIRING_TOP_K)), 100)
+        except ValueError:
+            return Response({"error": "limit должен быть числом"}, status=status.HTTP_400_BAD_REQUEST)
+
+        suggestions = suggest_sires(dam, request.user, max(limit, 1))
+        if suggestions is None:
+            return Response({"error": "У суки не указана порода"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(suggestions)
 
 class LitterViewSet(viewsets.ModelViewSet):
     serializer_class = LitterSerializer
     permission_classes = [permissions.IsAuthenticated, BreedingPermission]
 
     def get_queryset(self):
-        return Litter.objects.filter(owner=self.request.user)
+        # offspring/offspring_info сериализатора читают один prefetch вместо запроса на помет
+        return Litter.objects.filter(owner=self.request.user).select_related('dam', 'sire').prefetch_related(
+            Prefetch('offspring', queryset=Pet.objects.only('id', 'name', 'slug'))
+        )
+
+    @action(detail=False, methods=['get'])
+    def dashboard(self, request):
+        """
+        Сводка питомника: пометы, средний размер, выживаемость, успешность вязок, статистика по производителям.
+        GET /api/breeding/litters/dashboard/
+        """
+        return Response(kennel_dashboard(request.user.id))
 
     # === KILLER FEATURE: АВТО-ГЕНЕРАЦИЯ ЩЕНКОВ ===
     @action(detail=True, methods=['post'])
@@ -49,39 +95,65 @@ class LitterViewSet(viewsets.ModelViewSet):
         Создает карточки Pet для всего помета автоматически.
         POST /api/breeding/litters/{id}/generate_offspring/
         Body: { "prefix": "Puppy" } -> Creates "Puppy 1", "Puppy 2"...
+        Необязательно: "offspring": [{"name": "...", "gender": "F", "color": "..."}, ...] —
+        по элементу на детеныша по порядку; чего нет — берется по умолчанию.
+        Одна транзакция и постоянное число запросов при любом размере помета.
         """
         litter = self.get_object()
-        
-        if litter.offspring.exists():
-             return Response({"error": "Карточки для этого помета уже созданы"}, status=400)
-             
+
         count = litter.born_alive
         if count <= 0:
             return Response({"error": "Некого создавать (0 живых)"}, status=400)
 
+        details = request.data.get('offspring') or []
+        if not isinstance(details, list) or not all(isinstance(d, dict) for d in details):
+            return Response({"error": "offspring должен быть списком объектов"}, status=400)
+        if len(details) > count:
+            return Response({"error": f"В помете {count} живых, а передано {len(details)}"}, status=400)
+        genders = {choice for choice, _ in Pet.GENDER_CHOICES}
+        if any(d.get('gender') and d['gender'] not in genders for d in details):
+            return Response({"error": "gender: M или F"}, status=400)
+        details += [{}] * (count - len(details))
+
         prefix = request.data.get('prefix', f"{litter.litter_code} Baby")
-        
-        created_pets = []
-        for i in range(1, count + 1):
-            # Создаем питомца
-            new_pet = Pet.objects.create(
-                owner=request.user,
-                name=f"{prefix} #{i}",
-                gender='M', # По умолчанию, потом поменяют
-                birth_date=litter.birth_date,
-                mother=litter.dam,
-                father=litter.sire,
-                description=f"Из помета {litter.litter_code}"
+        names = [d.get('name') or f"{prefix} #{i}" for i, d in enumerate(details, start=1)]
+
+        with transaction.atomic():
+            # Блокируем помет: двойной клик не создаст карточки дважды
+            Litter.objects.select_for_update().filter(pk=litter.pk).first()
+            if litter.offspring.exists():
+                return Response({"error": "Карточки для этого помета уже созданы"}, status=400)
+
+            pets = Pet.objects.bulk_create([
+                Pet(
+                    owner=request.user,
+                    name=name,
+                    slug=slug,
+                    gender=d.get('gender', ''), # Пол не передали — уточнят в карточке
+                    birth_date=litter.birth_date,
+                    mother_id=litter.dam_id,
+                    father_id=litter.sire_id,
+                    description="\n".join(filter(None, [
+                        f"Из помета {litter.litter_code}",
+                        f"Окрас: {d['color']}" if d.get('color') else "",
+                    ])),
+                )
+                for name, slug, d in zip(names, Pet.make_unique_slugs(names), details)
+            ])
+
+            # Наследуем породу от матери (упрощенно): категории матери одним запросом
+            category_ids = list(
+                Pet.categories.through.objects.filter(pet_id=litter.dam_id).values_list('category_id', flat=True)
             )
-            
-            # Наследуем породу от матери (упрощенно)
-            # Если нужно, можно скопировать категории родителей
-            new_pet.categories.set(litter.dam.categories.all())
-            
-            litter.offspring.add(new_pet)
-            created_pets.append(new_pet.id)
+            Pet.categories.through.objects.bulk_create([
+                Pet.categories.through(pet_id=pet.id, category_id=category_id)
+                for pet in pets for category_id in category_ids
+            ])
+            Litter.offspring.through.objects.bulk_create([
+                Litter.offspring.through(litter_id=litter.id, pet_id=pet.id) for pet in pets
+            ])
 
         return Response({
             "message": f"Успешно создано {count} карточек.",
-            "pet_ids": created_pets
-        })
\ No newline at end of file
+            "pet_ids": [pet.id for pet in pets]
+        })
@@ -1,11 +1,13 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from .models import ChatRoom, ChatMessage
+from .presence import PresenceMixin, get_presence_store
 
-class ChatConsumer(AsyncWebsocketConsumer):
+class ChatConsumer(PresenceMixin, AsyncWebsocketConsumer):
     async def connect(self):
-        self.room_id = self.scope['url_route']['kwargs']['room_id']
+        self.room_id = int(self.scope['url_route']['kwargs']['room_id'])
         self.room_group_name = f'chat_{self.room_id}'
         self.user = self.scope.get("user")
 
@@ -19,8 +21,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         await self.accept()
+        await self.presence_connect()
+        await self.send_presence_snapshot(self.room_id)
 
     async def disconnect(self, close_code):
+        await self.presence_disconnect()
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
@@ -29,18 +34,45 @@ class ChatConsumer(AsyncWebsocketConsumer):
     # Получение сообщения от клиента
     async def receive(self, text_data):
         text_data_json = json.loads(text_data)
+
+        # Продление онлайна: клиент шлет {"type": "heartbeat"} чаще, чем PRESENCE_TTL
+        if text_data_json.get('type') == 'heartbeat':
+            await self.presence_heartbeat()
+            return
+
+        await self.handle_room_frame(self.room_id, text_data_json)
+
+    async def handle_room_frame(self, room_id, text_data_json):
+        """Кадры конкретной комнаты. Общие для ChatConsumer и MultiplexConsumer."""
+        room_group_name = f'chat_{room_id}'
+
+        # Квитанция о прочтении: {"type": "read_up_to", "message_id": 123}
+        if text_data_json.get('type') == 'read_up_to':
+            await self.handle_read_up_to(room_id, text_data_json.get('message_id'))
+            return
+
+        # "Печатает...": рассылаем не чаще раза в TYPING_THROTTLE секунд
+        if text_data_json.get('type') == 'typing':
+            if await get_presence_store().allow_typing(room_id, self.user.id):
+                await self.channel_layer.group_send(
+                    room_group_name,
+                    {'type': 'typing_event', 'room_id': room_id, 'user_id': self.user.id}
+                )
+            return
+
         message_text = text_data_json.get('message', '')
         # attachment_id здесь - это ID сообщения, которое уже создано через REST API
         attachment_id = text_data_json.get('attachment_id', None)
 
         # [FIX] Сохраняем или обновляем сообщение
-        msg = await self.save_message(self.user, self.room_id, message_text, attachment_id)
+        msg = await self.save_message(self.user, room_id, message_text, attachment_id)
 
         # Отправка обновления всем (включая отправителя)
         await self.channel_layer.group_send(
-            self.room_group_name,
+            room_group_name,
             {
                 'type': 'chat_message',
+                'room_id': room_id,
                 'id': msg.id,
                 'message': msg.text,          # Используем актуальный текст из объекта
                 'sender_id': self.user.id,
@@ -51,23 +83,91 @@ class ChatConsumer(AsyncWebsocketConsumer):
             }
         )
 
+    async def send_room_frame(self, event, payload):
+        """Отправка кадра комнаты клиенту. MultiplexConsumer добавляет сюда адресацию."""
+        await self.send(text_data=json.dumps(payload))
+
+    async def send_presence_snapshot(self, room_id):
+        # Сразу отдаем, кто из участников комнаты онлайн (без отдельного поллинга)
+        member_ids = await self.get_room_member_ids(room_id)
+        online_ids = await get_presence_store().online_user_ids(member_ids)
+        for member_id in member_ids:
+            await self.send_room_frame({'room_id': room_id}, {
+                'type': 'presence',
+                'user_id': member_id,
+                'online': member_id in online_ids,
+            })
+
     # Отправка данных в WebSocket
     async def chat_message(self, event):
-        await self.send(text_data=json.dumps({
+        await self.send_room_frame(event, {
             'id': event['id'],
             'message': event['message'],
             'sender_id': event['sender_id'],
             'sender_name': event['sender_name'],
             'attachment': event.get('attachment'),
+            'preview': event.get('preview'),
             'created_at': event['created_at'],
-        }))
+        })
+
+    async def handle_read_up_to(self, room_id, message_id):
+        try:
+            up_to = int(message_id)
+        except (TypeError, ValueError):
+            return
+
+        updated = await self.mark_read_up_to(self.user, room_id, up_to)
+
+        # Если ничего не поменялось — не шумим в группу
+        if not updated:
+            return
+
+        await self.channel_layer.group_send(
+            f'chat_{room_id}',
+            {
+                'type': 'read_receipt',
+                'room_id': room_id,
+                'reader_id': self.user.id,
+                'up_to': up_to,
+            }
+        )
+
+    # Компактное событие "прочитано до id" для всех участников комнаты
+    async def read_receipt(self, event):
+        await self.send_room_frame(event, {
+            'type': 'read_receipt',
+            'reader_id': event['reader_id'],
+            'up_to': event['up_to'],
+        })
+
+    async def typing_event(self, event):
+        # Себе "печатает" не показываем
+        if event['user_id'] == self.user.id:
+            return
+        await self.send_room_frame(event, {
+            'type': 'typing',
+            'user_id': event['user_id'],
+            # Клиент гасит индикатор сам, если за это время не пришло нового события
+            'ttl': settings.TYPING_THROTTLE * 2,
+        })
+
+    async def presence_update(self, event):
+        await self.send_room_frame(event, {
+            'type': 'presence',
+            'user_id': event['user_id'],
+            'online': event['online'],
+        })
+
+    @database_sync_to_async
+    def get_room_member_ids(self, room_id):
+        return list(ChatRoom.objects.filter(id=room_id).values_list('owner_id', 'vet_id').first() or [])
 
     @database_sync_to_async
     def can_access_room(self, user, room_id):
         if not user.is_authenticated: return False
         try:
-            room = ChatRoom.objects.get(id=room_id)
-            return user == room.owner or user == room.vet
+            room = ChatRoom.objects.only('owner_id', 'vet_id').get(id=room_id)
+            return user.id in (room.owner_id, room.vet_id)
         except ChatRoom.DoesNotExist:
             return False
 
@@ -91,7 +191,118 @@ class ChatConsumer(AsyncWebsocketConsumer):
             msg = ChatMessage.objects.create(room=room, sender=user, text=text)
         
         # Обновляем "время последнего сообщения" в комнате
-        room.updated_at = msg.created_at
-        room.save()
+        ChatRoom.objects.filter(id=room.id).update(updated_at=msg.created_at)
         
-        return msg
\ No newline at end of file
+        return msg
+
+    @database_sync_to_async
+    def mark_read_up_to(self, user, room_id, up_to):
+        """
+        Одним UPDATE помечает прочитанными все входящие сообщения комнаты до up_to включительно.
+        Свои сообщения не трогаем — их читает собеседник.
+        """
+        return ChatMessage.objects.filter(
+            room_id=room_id,
+            id__lte=up_to,
+            is_read=False
+        ).exclude(sender=user).update(is_read=True)
+
+
+class MultiplexConsumer(ChatConsumer):
+    """
+    Один сокет на клиента: уведомления + любое число чат-комнат.
+    ws/stream/?token=... — JWT и пользователь проверяются один раз на соединение.
+
+    Клиент -> сервер:
+      {"type": "subscribe", "room_id": 1} / {"type": "unsubscribe", "room_id": 1}
+      {"type": "message" | "typing" | "read_up_to", "room_id": 1, ...} — как в ChatConsumer
+      {"type": "heartbeat"}
+    Сервер -> клиент: кадры ChatConsumer с "stream": "chat" и "room_id",
+    уведомления — с "stream": "notifications".
+    """
+    MAX_ROOMS = 100
+
+    async def connect(self):
+        self.user = self.scope.get("user")
+        self.rooms = set()
+
+        if not self.user or self.user.is_anonymous:
+            await self.close()
+            return
+
+        # Та же персональная группа, что и у NotificationConsumer
+        self.user_group_name = f"user_{self.user.id}"
+        await self.channel_layer.group_add(self.user_group_name, self.channel_name)
+        await self.accept()
+        await self.presence_connect()
+
+    async def disconnect(self, close_code):
+        await self.presence_disconnect()
+        for room_id in self.rooms:
+            await self.channel_layer.group_discard(f'chat_{room_id}', self.channel_name)
+        if hasattr(self, 'user_group_name'):
+            await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
+
+    async def receive(self, text_data):
+        text_data_json = json.loads(text_data)
+        frame_type = text_data_json.get('type')
+
+        if frame_type == 'heartbeat':
+            await self.presence_heartbeat()
+            return
+
+        try:
+            room_id = int(text_data_json.get('room_id'))
+        except (TypeError, ValueError):
+            await self.send_error("Не указан room_id")
+            return
+
+        if frame_type == 'subscribe':
+            await self.subscribe(room_id)
+        elif frame_type == 'unsubscribe':
+            await self.unsubscribe(room_id)
+        elif room_id in self.rooms:
+            await self.handle_room_frame(room_id, text_data_json)
+        else:
+            await self.send_error("Нет подписки на эту комнату", room_id)
+
+    async def subscribe(self, room_id):
+        if room_id in self.rooms:
+            return
+        if len(self.rooms) >= self.MAX_ROOMS:
+            await self.send_error("Слишком много открытых комнат", room_id)
+            return
+        if not await self.can_access_room(self.user, room_id):
+            await self.send_error("Нет доступа к этому чату", room_id)
+            return
+
+        await self.channel_layer.group_add(f'chat_{room_id}', self.channel_name)
+        self.rooms.add(room_id)
+        await self.send_room_frame({'room_id': room_id}, {'type': 'subscribed'})
+        await self.send_presence_snapshot(room_id)
+
+    async def unsubscribe(self, room_id):
+        if room_id not in self.rooms:
+            return
+        self.rooms.discard(room_id)
+        await self.channel_layer.group_discard(f'chat_{room_id}', self.channel_name)
+        await self.send_room_frame({'room_id': room_id}, {'type': 'unsubscribed'})
+
+    async def send_room_frame(self, event, payload):
+        await self.send(text_data=json.dumps({'stream': 'chat', 'room_id': event['room_id'], **payload}))
+
+    async def send_error(self, error, room_id=None):
+        await self.send(text_data=json.dumps({'type': 'error', 'error': error, 'room_id': room_id}))
+
+    async def presence_update(self, event):
+        # Presence рассылается во все комнаты юзера; шлем только по открытым
+        if event['room_id'] in self.rooms:
+            await super().presence_update(event)
+
+    # Уведомления из notifications.services (группа user_<id>)
+    async def send_notification(self, event):
+        await self.send(text_data=json.dumps({'stream': 'notifications', **event["data"]}))
+
+    async def unread_count(self, event):
+        await self.send(text_data=json.dumps({'stream': 'notifications', 'type': 'unread_count', 'count': event['count']}))
+
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-19 14:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_alter_chatmessage_options_alter_chatmessage_text'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['room', 'is_read'], name='chat_msg_room_is_read_idx'),
+        ),
+    ]
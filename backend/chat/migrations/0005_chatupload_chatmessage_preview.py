@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-19 14:37
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_chatmessage_room_is_read_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='preview',
+            field=models.ImageField(blank=True, null=True, upload_to='chat_previews/%Y/%m/'),
+        ),
+        migrations.CreateModel(
+            name='ChatUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='Имя файла')),
+                ('content_type', models.CharField(blank=True, max_length=100, verbose_name='MIME-тип')),
+                ('total_size', models.PositiveBigIntegerField(verbose_name='Размер файла (байт)')),
+                ('received_bytes', models.PositiveBigIntegerField(default=0, verbose_name='Получено байт')),
+                ('checksum', models.CharField(blank=True, max_length=64, verbose_name='SHA-256 всего файла')),
+                ('status', models.CharField(choices=[('uploading', 'Загружается'), ('processing', 'Обрабатывается'), ('done', 'Готово'), ('failed', 'Ошибка')], default='uploading', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.chatmessage')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='chat.chatroom')),
+                ('uploader', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Загрузка вложения',
+                'verbose_name_plural': 'Загрузки вложений',
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-19 14:40
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_chatupload_chatmessage_preview'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.SearchVector('text', config='russian'), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='chat_msg_search_gin'),
+        ),
+    ]
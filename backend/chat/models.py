@@ -1,5 +1,12 @@
+import os
+import uuid
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+
+# Конфигурация полнотекстового поиска: русская морфология, латиница стеммится как английская
+CHAT_SEARCH_CONFIG = 'russian'
 
 class ChatRoom(models.Model):
     """
@@ -53,12 +60,80 @@ class ChatMessage(models.Model):
     text = models.TextField(verbose_name="Текст сообщения", blank=True, default="")
     
     attachment = models.FileField(upload_to='chat_attachments/%Y/%m/', null=True, blank=True)
+    # Превью для картинок (генерируется в Celery после загрузки)
+    preview = models.ImageField(upload_to='chat_previews/%Y/%m/', null=True, blank=True)
     
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Хранимый tsvector: считается самой БД при INSERT/UPDATE текста
+    search_vector = models.GeneratedField(
+        expression=SearchVector('text', config=CHAT_SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
     class Meta:
         ordering = ['created_at'] # Сортировка по порядку создания
+        indexes = [
+            # Быстрый подсчет непрочитанных по комнате (список чатов без поллинга)
+            models.Index(fields=['room', 'is_read'], name='chat_msg_room_is_read_idx'),
+            # Поиск по тексту (дозировки, препараты) без seq scan
+            GinIndex(fields=['search_vector'], name='chat_msg_search_gin'),
+        ]
+
+    def __str__(self):
+        return f"Msg {self.id} from {self.sender}"
+
+
+class ChatUpload(models.Model):
+    """
+    Сессия чанковой (возобновляемой) загрузки вложения.
+    Куски пишутся во временный файл, финализация (проверка, превью, сообщение) — в Celery.
+    """
+    STATUS_CHOICES = [
+        ('uploading', 'Загружается'),
+        ('processing', 'Обрабатывается'),
+        ('done', 'Готово'),
+        ('failed', 'Ошибка'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    room = models.ForeignKey(
+        ChatRoom,
+        on_delete=models.CASCADE,
+        related_name='uploads'
+    )
+    uploader = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='chat_uploads'
+    )
+    filename = models.CharField(max_length=255, verbose_name="Имя файла")
+    content_type = models.CharField(max_length=100, blank=True, verbose_name="MIME-тип")
+    total_size = models.PositiveBigIntegerField(verbose_name="Размер файла (байт)")
+    received_bytes = models.PositiveBigIntegerField(default=0, verbose_name="Получено байт")
+    checksum = models.CharField(max_length=64, blank=True, verbose_name="SHA-256 всего файла")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    error = models.TextField(blank=True)
+
+    message = models.ForeignKey(
+        ChatMessage,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='+'
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Загрузка вложения"
+        verbose_name_plural = "Загрузки вложений"
 
     def __str__(self):
-        return f"Msg {self.id} from {self.sender}"
\ No newline at end of file
+        return f"Upload {self.id} ({self.filename}, {self.received_bytes}/{self.total_size})"
+
+    @property
+    def temp_path(self):
+        return os.path.join(settings.CHAT_UPLOAD_TEMP_DIR, f"{self.id}.part")
@@ -0,0 +1,168 @@
+import time
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from redis import asyncio as aioredis
+
+from .models import ChatRoom
+
+
+class RedisPresenceStore:
+    """
+    Онлайн-статус в Redis.
+    presence:<user_id> — ZSET из channel_name всех сокетов юзера, score = момент протухания.
+    Ключ живет PRESENCE_TTL секунд и продлевается heartbeat'ом, поэтому упавший воркер
+    не оставляет "вечный онлайн".
+    """
+
+    def __init__(self, url, ttl, typing_throttle):
+        self.redis = aioredis.from_url(url)
+        self.ttl = ttl
+        self.typing_throttle = typing_throttle
+
+    def _key(self, user_id):
+        return f"presence:{user_id}"
+
+    async def connect(self, user_id, channel_name):
+        """Регистрирует сокет. True — если юзер только что стал онлайн."""
+        now = time.time()
+        key = self._key(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(key, '-inf', now)
+            pipe.zcard(key)
+            pipe.zadd(key, {channel_name: now + self.ttl})
+            pipe.expire(key, self.ttl)
+            _, before, _, _ = await pipe.execute()
+        return before == 0
+
+    async def heartbeat(self, user_id, channel_name):
+        key = self._key(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(key, {channel_name: time.time() + self.ttl})
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def disconnect(self, user_id, channel_name):
+        """Снимает сокет. True — если это был последний живой сокет юзера."""
+        key = self._key(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(key, channel_name)
+            pipe.zremrangebyscore(key, '-inf', time.time())
+            pipe.zcard(key)
+            _, _, left = await pipe.execute()
+        return left == 0
+
+    async def online_user_ids(self, user_ids):
+        now = time.time()
+        user_ids = list(user_ids)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.zcount(self._key(user_id), now, '+inf')
+            counts = await pipe.execute()
+        return {user_id for user_id, count in zip(user_ids, counts) if count}
+
+    async def allow_typing(self, room_id, user_id):
+        """Не чаще одного события "печатает" на юзера в комнате за окно TYPING_THROTTLE."""
+        return bool(await self.redis.set(
+            f"typing:{room_id}:{user_id}", 1, nx=True, ex=self.typing_throttle
+        ))
+
+
+class InMemoryPresenceStore:
+    """
+    Замена Redis для тестов и локальной разработки (как InMemoryChannelLayer).
+    Работает только в пределах одного процесса.
+    """
+
+    def __init__(self, ttl, typing_throttle):
+        self.ttl = ttl
+        self.typing_throttle = typing_throttle
+        self.sockets = {}
+        self.typing = {}
+
+    def _alive(self, user_id):
+        now = time.time()
+        sockets = self.sockets.setdefault(user_id, {})
+        for channel_name, expires in list(sockets.items()):
+            if expires <= now:
+                del sockets[channel_name]
+        return sockets
+
+    async def connect(self, user_id, channel_name):
+        sockets = self._alive(user_id)
+        became_online = not sockets
+        sockets[channel_name] = time.time() + self.ttl
+        return became_online
+
+    async def heartbeat(self, user_id, channel_name):
+        self._alive(user_id)[channel_name] = time.time() + self.ttl
+
+    async def disconnect(self, user_id, channel_name):
+        sockets = self._alive(user_id)
+        sockets.pop(channel_name, None)
+        return not sockets
+
+    async def online_user_ids(self, user_ids):
+        return {user_id for user_id in user_ids if self._alive(user_id)}
+
+    async def allow_typing(self, room_id, user_id):
+        now = time.time()
+        key = (room_id, user_id)
+        if self.typing.get(key, 0) > now:
+            return False
+        self.typing[key] = now + self.typing_throttle
+        return True
+
+
+_store = None
+
+
+def get_presence_store():
+    global _store
+    if _store is None:
+        if settings.PRESENCE_STORE == 'memory':
+            _store = InMemoryPresenceStore(settings.PRESENCE_TTL, settings.TYPING_THROTTLE)
+        else:
+            _store = RedisPresenceStore(
+                settings.PRESENCE_REDIS_URL, settings.PRESENCE_TTL, settings.TYPING_THROTTLE
+            )
+    return _store
+
+
+@database_sync_to_async
+def get_user_room_ids(user_id):
+    return list(
+        ChatRoom.objects.filter(Q(owner_id=user_id) | Q(vet_id=user_id)).values_list('id', flat=True)
+    )
+
+
+class PresenceMixin:
+    """
+    Общая логика онлайн-статуса для ChatConsumer и NotificationConsumer.
+    Событие presence рассылается в комнаты юзера только при смене состояния
+    (первый сокет открылся / последний закрылся), а не на каждое подключение.
+    """
+
+    async def presence_connect(self):
+        self.presence_joined = True
+        if await get_presence_store().connect(self.user.id, self.channel_name):
+            await self.broadcast_presence(online=True)
+
+    async def presence_heartbeat(self):
+        await get_presence_store().heartbeat(self.user.id, self.channel_name)
+
+    async def presence_disconnect(self):
+        if not getattr(self, 'presence_joined', False):
+            return
+        if await get_presence_store().disconnect(self.user.id, self.channel_name):
+            await self.broadcast_presence(online=False)
+
+    async def broadcast_presence(self, online):
+        for room_id in await get_user_room_ids(self.user.id):
+            await self.channel_layer.group_send(f'chat_{room_id}', {
+                'type': 'presence_update',
+                'room_id': room_id,
+                'user_id': self.user.id,
+                'online': online,
+            })
@@ -3,4 +3,6 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/chat/(?P<room_id>\d+)/$', consumers.ChatConsumer.as_asgi()),
+    # Один сокет на клиента: уведомления + подписки на комнаты сообщениями
+    re_path(r'ws/stream/$', consumers.MultiplexConsumer.as_asgi()),
 ]
\ No newline at end of file
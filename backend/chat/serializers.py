@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import ChatRoom, ChatMessage
+from django.conf import settings
+from django.utils.html import escape
+from .models import ChatRoom, ChatMessage, ChatUpload
 from pets.models import Pet
 
 User = get_user_model()
@@ -34,27 +36,74 @@ class ChatMessageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ChatMessage
-        fields = ['id', 'room', 'sender', 'sender_name', 'sender_avatar', 'text', 'attachment', 'is_read', 'created_at']
-        read_only_fields = ['id', 'sender', 'created_at', 'is_read']
+        fields = ['id', 'room', 'sender', 'sender_name', 'sender_avatar', 'text', 'attachment', 'preview', 'is_read', 'created_at']
+        read_only_fields = ['id', 'sender', 'created_at', 'is_read', 'preview']
 
     def get_sender_avatar(self, obj):
         if hasattr(obj.sender, 'avatar') and obj.sender.avatar:
              return obj.sender.avatar.url
         return None
 
+# Маркеры совпадений, которые ts_headline ставит в сырой текст; в <mark> превращаются после экранирования
+SNIPPET_START = '\x02'
+SNIPPET_STOP = '\x03'
+
+class ChatMessageSearchSerializer(ChatMessageSerializer):
+    # Фрагмент текста с <mark>...</mark> вокруг найденных слов; остальной текст экранирован
+    snippet = serializers.SerializerMethodField()
+
+    class Meta(ChatMessageSerializer.Meta):
+        fields = ChatMessageSerializer.Meta.fields + ['snippet']
+
+    def get_snippet(self, obj):
+        # Текст сообщения пишет пользователь: сначала экранируем, потом расставляем разметку
+        return (
+            escape(obj.snippet)
+            .replace(SNIPPET_START, '<mark>')
+            .replace(SNIPPET_STOP, '</mark>')
+        )
+
 class ChatRoomSerializer(serializers.ModelSerializer):
     # ... (без изменений) ...
     vet = UserShortSerializer(read_only=True)
     owner = UserShortSerializer(read_only=True)
     pet = PetShortSerializer(read_only=True)
     last_message = serializers.SerializerMethodField()
+    # Аннотируется в ChatRoomViewSet.get_queryset
+    unread_count = serializers.IntegerField(read_only=True, default=0)
 
     class Meta:
         model = ChatRoom
-        fields = ['id', 'pet', 'vet', 'owner', 'updated_at', 'is_active', 'last_message']
+        fields = ['id', 'pet', 'vet', 'owner', 'updated_at', 'is_active', 'last_message', 'unread_count']
 
     def get_last_message(self, obj):
         last_msg = obj.messages.order_by('-created_at').first()
         if last_msg:
             return ChatMessageSerializer(last_msg).data
-        return None
\ No newline at end of file
+        return None
+
+class ChatUploadSerializer(serializers.ModelSerializer):
+    room_id = serializers.PrimaryKeyRelatedField(queryset=ChatRoom.objects.all(), source='room')
+
+    class Meta:
+        model = ChatUpload
+        fields = [
+            'id', 'room_id', 'filename', 'content_type', 'total_size', 'checksum',
+            'received_bytes', 'status', 'error', 'message', 'created_at'
+        ]
+        read_only_fields = ['id', 'received_bytes', 'status', 'error', 'message', 'created_at']
+
+    def validate_room_id(self, room):
+        user = self.context['request'].user
+        if user != room.owner and user != room.vet:
+            raise serializers.ValidationError("Нет доступа к этому чату")
+        return room
+
+    def validate_total_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Пустой файл")
+        if value > settings.CHAT_UPLOAD_MAX_FILE_SIZE:
+            raise serializers.ValidationError(
+                f"Файл больше допустимого ({settings.CHAT_UPLOAD_MAX_FILE_SIZE} байт)"
+            )
+        return value
@@ -0,0 +1,121 @@
+import hashlib
+import io
+import logging
+import os
+
+from asgiref.sync import async_to_sync
+from celery import shared_task
+from channels.layers import get_channel_layer
+from django.core.files import File
+from django.core.files.base import ContentFile
+from PIL import Image
+
+from .models import ChatRoom, ChatMessage, ChatUpload
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_SIZE = (480, 480)
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def remove_temp_file(path):
+    """Удаление куска загрузки; уже удаленный (повтор задачи, ручная чистка) — не ошибка."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def file_sha256(path):
+    """Считает SHA-256 файла блоками, не загружая его целиком в память."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_image_preview(path):
+    """
+    Уменьшенная JPEG-копия картинки. Для не-картинок возвращает None.
+    PDF не рендерим: в зависимостях нет растеризатора, клиент показывает иконку.
+    """
+    try:
+        with Image.open(path) as img:
+            img.thumbnail(PREVIEW_SIZE)
+            buffer = io.BytesIO()
+            img.convert('RGB').save(buffer, format='JPEG', quality=80)
+    except (OSError, Image.DecompressionBombError):
+        return None
+    return ContentFile(buffer.getvalue())
+
+
+@shared_task
+def finalize_chat_upload(upload_id):
+    """
+    Финализация чанковой загрузки:
+    проверка контрольной суммы -> перенос в хранилище -> превью -> сообщение -> пуш в комнату.
+    """
+    try:
+        upload = ChatUpload.objects.select_related('uploader').get(id=upload_id, status='processing')
+    except ChatUpload.DoesNotExist:
+        return
+
+    path = upload.temp_path
+    try:
+        message = _finalize(upload, path)
+    except Exception:
+        # Иначе загрузка навсегда осталась бы в processing, а клиент опрашивал бы ее бесконечно
+        logger.exception("chat upload %s: finalize failed", upload.id)
+        upload.status = 'failed'
+        upload.error = "Не удалось обработать файл"
+        upload.save(update_fields=['status', 'error', 'updated_at'])
+        remove_temp_file(path)
+        return
+    if message is None:
+        return
+
+    async_to_sync(get_channel_layer().group_send)(
+        f'chat_{upload.room_id}',
+        {
+            'type': 'chat_message',
+            'room_id': upload.room_id,
+            'id': message.id,
+            'message': message.text,
+            'sender_id': upload.uploader.id,
+            'sender_name': upload.uploader.username,
+            'attachment': message.attachment.url,
+            'preview': message.preview.url if message.preview else None,
+            'created_at': message.created_at.isoformat(),
+        }
+    )
+
+
+def _finalize(upload, path):
+    """Проверка суммы, перенос в хранилище, превью и сообщение. None — сумма не совпала."""
+    if upload.checksum and file_sha256(path) != upload.checksum.lower():
+        upload.status = 'failed'
+        upload.error = "Контрольная сумма файла не совпала"
+        upload.save(update_fields=['status', 'error', 'updated_at'])
+        remove_temp_file(path)
+        return None
+
+    message = ChatMessage(room_id=upload.room_id, sender=upload.uploader, text="")
+    with open(path, 'rb') as fh:
+        message.attachment.save(upload.filename, File(fh), save=False)
+
+    base_name = os.path.splitext(upload.filename)[0]
+    preview = build_image_preview(path) if upload.content_type.startswith('image/') else None
+    if preview:
+        message.preview.save(f"{base_name}_preview.jpg", preview, save=False)
+
+    message.save()
+
+    # Поднимаем чат вверх списка без полного room.save()
+    ChatRoom.objects.filter(id=upload.room_id).update(updated_at=message.created_at)
+
+    upload.status = 'done'
+    upload.message = message
+    upload.save(update_fields=['status', 'message', 'updated_at'])
+    remove_temp_file(path)
+    return message
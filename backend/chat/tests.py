@@ -1,3 +1,135 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
 
-# Create your tests here.
+import chat.routing
+from chat import presence
+from chat.models import ChatRoom
+from pets.models import Pet
+
+User = get_user_model()
+
+
+@override_settings(
+    PRESENCE_STORE='memory',
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class PresenceTests(TransactionTestCase):
+    """Онлайн-статус и "печатает" на in-memory заменах Redis и channel layer."""
+
+    def setUp(self):
+        presence._store = None
+        self.owner = User.objects.create(username='owner')
+        self.vet = User.objects.create(username='vet', is_veterinarian=True)
+        pet = Pet.objects.create(name='Rex', owner=self.owner)
+        self.room = ChatRoom.objects.create(pet=pet, vet=self.vet, owner=self.owner)
+        self.app = URLRouter(chat.routing.websocket_urlpatterns)
+
+    async def open_socket(self, user):
+        communicator = WebsocketCommunicator(self.app, f'/ws/chat/{self.room.id}/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def drain(self, communicator):
+        frames = []
+        while not await communicator.receive_nothing(timeout=0.05):
+            frames.append(await communicator.receive_json_from())
+        return frames
+
+    def test_presence_is_coalesced_across_sockets(self):
+        async def scenario():
+            vet_socket = await self.open_socket(self.vet)
+            snapshot = await self.drain(vet_socket)
+
+            first = await self.open_socket(self.owner)
+            second = await self.open_socket(self.owner)
+            after_connect = await self.drain(vet_socket)
+
+            await first.disconnect()
+            after_first_close = await self.drain(vet_socket)
+            await second.disconnect()
+            after_last_close = await self.drain(vet_socket)
+
+            await vet_socket.disconnect()
+            return snapshot, after_connect, after_first_close, after_last_close
+
+        snapshot, after_connect, after_first_close, after_last_close = async_to_sync(scenario)()
+
+        self.assertIn({'type': 'presence', 'user_id': self.vet.id, 'online': True}, snapshot)
+        self.assertIn({'type': 'presence', 'user_id': self.owner.id, 'online': False}, snapshot)
+        # Два сокета владельца -> одно событие "онлайн"; "оффлайн" только после последнего
+        self.assertEqual(after_connect, [{'type': 'presence', 'user_id': self.owner.id, 'online': True}])
+        self.assertEqual(after_first_close, [])
+        self.assertEqual(after_last_close, [{'type': 'presence', 'user_id': self.owner.id, 'online': False}])
+
+    @override_settings(TYPING_THROTTLE=30)
+    def test_typing_is_rate_limited(self):
+        async def scenario():
+            vet_socket = await self.open_socket(self.vet)
+            owner_socket = await self.open_socket(self.owner)
+            await self.drain(vet_socket)
+            await self.drain(owner_socket)
+
+            for _ in range(5):
+                await owner_socket.send_json_to({'type': 'typing'})
+            received = await self.drain(vet_socket)
+            echoed = await self.drain(owner_socket)
+
+            await vet_socket.disconnect()
+            await owner_socket.disconnect()
+            return received, echoed
+
+        received, echoed = async_to_sync(scenario)()
+
+        self.assertEqual(received, [{'type': 'typing', 'user_id': self.owner.id, 'ttl': 60}])
+        self.assertEqual(echoed, [])
+
+    def test_multiplexed_socket_carries_rooms_and_notifications(self):
+        async def scenario():
+            communicator = WebsocketCommunicator(self.app, '/ws/stream/')
+            communicator.scope['user'] = self.owner
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+
+            await communicator.send_json_to({'type': 'message', 'room_id': self.room.id, 'message': 'hi'})
+            not_subscribed = await communicator.receive_json_from()
+
+            await communicator.send_json_to({'type': 'subscribe', 'room_id': self.room.id})
+            subscribed = await self.drain(communicator)
+
+            await communicator.send_json_to({'type': 'message', 'room_id': self.room.id, 'message': 'hi'})
+            message = await communicator.receive_json_from()
+
+            await communicator.send_json_to({'type': 'unsubscribe', 'room_id': self.room.id})
+            await self.drain(communicator)
+            await get_channel_layer().group_send(
+                f'user_{self.owner.id}', {'type': 'send_notification', 'data': {'id': 1}}
+            )
+            notification = await communicator.receive_json_from()
+
+            await communicator.disconnect()
+            return not_subscribed, subscribed, message, notification
+
+        not_subscribed, subscribed, message, notification = async_to_sync(scenario)()
+
+        self.assertEqual(not_subscribed['type'], 'error')
+        self.assertEqual(subscribed[0], {'stream': 'chat', 'room_id': self.room.id, 'type': 'subscribed'})
+        self.assertEqual(message['stream'], 'chat')
+        self.assertEqual(message['room_id'], self.room.id)
+        self.assertEqual(message['message'], 'hi')
+        self.assertEqual(notification, {'stream': 'notifications', 'id': 1})
+
+    @override_settings(PRESENCE_TTL=0)
+    def test_socket_without_heartbeat_expires(self):
+        store = presence.get_presence_store()
+
+        async def scenario():
+            await store.connect(self.owner.id, 'channel-1')
+            return await store.online_user_ids([self.owner.id])
+
+        self.assertEqual(async_to_sync(scenario)(), set())
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ChatRoomViewSet, ChatMessageViewSet, ChatAttachmentUploadView
+from .views import ChatRoomViewSet, ChatMessageViewSet, ChatAttachmentUploadView, ChatUploadViewSet
 
 router = DefaultRouter()
 router.register(r'rooms', ChatRoomViewSet, basename='chat-rooms')
 router.register(r'messages', ChatMessageViewSet, basename='chat-messages')
+router.register(r'uploads', ChatUploadViewSet, basename='chat-uploads')  # Чанковая загрузка
 
 urlpatterns = [
     # Подключаем роутер (генерирует /rooms/ и /messages/)
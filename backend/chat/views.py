@@ -1,18 +1,37 @@
+import hashlib
+import os
+
 from rest_framework import viewsets, permissions, mixins, status
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.pagination import PageNumberPagination
-from django.db.models import Q
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from django.db.models import Q, Count
+from django.contrib.postgres.search import SearchQuery, SearchHeadline
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.conf import settings
+
+from .models import ChatRoom, ChatMessage, ChatUpload, CHAT_SEARCH_CONFIG
+from .serializers import (
+    ChatRoomSerializer, ChatMessageSerializer, ChatUploadSerializer, ChatMessageSearchSerializer,
+    SNIPPET_START, SNIPPET_STOP,
+)
+from .tasks import finalize_chat_upload
 
-from .models import ChatRoom, ChatMessage
-from .serializers import ChatRoomSerializer, ChatMessageSerializer
+# Читаем тело куска блоками, чтобы не держать его целиком в памяти
+STREAM_BLOCK_SIZE = 64 * 1024
 
 class ChatPagination(PageNumberPagination):
     page_size = 50
     page_size_query_param = 'page_size'
 
+class ChatSearchPagination(CursorPagination):
+    # Keyset по id: стабильные страницы без OFFSET на любой глубине истории
+    page_size = 20
+    ordering = '-id'
+
 class ChatRoomViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ChatRoomSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -22,13 +41,24 @@ class ChatRoomViewSet(viewsets.ReadOnlyModelViewSet):
         # Возвращаем чаты, где юзер либо владелец, либо вет
         return ChatRoom.objects.filter(
             Q(owner=user) | Q(vet=user)
-        ).select_related('pet', 'vet', 'owner').order_by('-updated_at')
+        ).select_related('pet', 'vet', 'owner').annotate(
+            # Непрочитанные входящие считаются одним запросом по индексу (room, is_read)
+            unread_count=Count(
+                'messages',
+                filter=Q(messages__is_read=False) & ~Q(messages__sender=user)
+            )
+        ).order_by('-updated_at')
 
 class ChatMessageViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     serializer_class = ChatMessageSerializer
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = ChatPagination
 
+    def get_serializer_class(self):
+        if self.action == 'search':
+            return ChatMessageSearchSerializer
+        return super().get_serializer_class()
+
     def get_queryset(self):
         user = self.request.user
         
@@ -42,7 +72,45 @@ class ChatMessageViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
         return ChatMessage.objects.filter(
             room_id=room_id, 
             room__in=ChatRoom.objects.filter(Q(owner=user) | Q(vet=user))
-        ).order_by('-created_at')
+        ).defer('search_vector').order_by('-created_at')
+
+    @action(detail=False, methods=['get'], pagination_class=ChatSearchPagination)
+    def search(self, request):
+        """
+        Полнотекстовый поиск по сообщениям своих комнат (GIN по хранимому tsvector).
+        GET /api/chat/messages/search/?q=амоксициллин 250&room_id=5&cursor=...
+        """
+        user = request.user
+        query_text = request.query_params.get('q', '').strip()
+        if not query_text:
+            return Response({"error": "Пустой запрос"}, status=status.HTTP_400_BAD_REQUEST)
+
+        query = SearchQuery(query_text, config=CHAT_SEARCH_CONFIG, search_type='websearch')
+        queryset = ChatMessage.objects.filter(
+            room__in=ChatRoom.objects.filter(Q(owner=user) | Q(vet=user)),
+            search_vector=query
+        )
+
+        room_id = request.query_params.get('room_id')
+        if room_id:
+            if not room_id.isdigit():
+                return Response({"error": "Некорректный room_id"}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(room_id=room_id)
+
+        # Сниппет считается только для строк текущей страницы (LIMIT применяется раньше SELECT-выражений).
+        # Совпадения помечаются служебными символами, <mark> ставит сериализатор после экранирования.
+        queryset = queryset.select_related('sender').defer('search_vector').annotate(
+            snippet=SearchHeadline(
+                'text', query,
+                config=CHAT_SEARCH_CONFIG,
+                start_sel=SNIPPET_START, stop_sel=SNIPPET_STOP,
+                max_words=25, min_words=10,
+            )
+        )
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
     
 class ChatAttachmentUploadView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -72,13 +140,111 @@ class ChatAttachmentUploadView(APIView):
             text="" # Благодаря миграции это поле теперь optional
         )
         
-        # Поднимаем чат вверх списка
-        room.updated_at = message.created_at
-        room.save()
+        # Поднимаем чат вверх списка (точечный UPDATE вместо полного room.save())
+        ChatRoom.objects.filter(id=room.id).update(updated_at=message.created_at)
 
         # Возвращаем данные для сокета
         return Response({
             "id": message.id,
             "attachment": message.attachment.url,
             "created_at": message.created_at
-        }, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        }, status=status.HTTP_201_CREATED)
+
+class ChatUploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Возобновляемая чанковая загрузка больших вложений.
+    POST /api/chat/uploads/                 -> сессия {room_id, filename, content_type, total_size, checksum}
+    GET  /api/chat/uploads/{id}/            -> received_bytes (с какого места докачивать)
+    PUT  /api/chat/uploads/{id}/chunk/      -> сырые байты куска; заголовки Upload-Offset и X-Chunk-Checksum (SHA-256)
+    POST /api/chat/uploads/{id}/complete/   -> финализация в Celery, сообщение придет в сокет комнаты
+    """
+    serializer_class = ChatUploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = ChatUpload.objects.filter(uploader=self.request.user)
+        if self.action in ('chunk', 'complete'):
+            # Блокируем сессию: два куска одной загрузки не пишут в файл одновременно
+            queryset = queryset.select_for_update()
+        return queryset
+
+    def perform_create(self, serializer):
+        upload = serializer.save(uploader=self.request.user)
+        os.makedirs(settings.CHAT_UPLOAD_TEMP_DIR, exist_ok=True)
+        open(upload.temp_path, 'wb').close()
+
+    @action(detail=True, methods=['put'])
+    def chunk(self, request, pk=None):
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return Response({"error": "Некорректный Content-Length или Upload-Offset"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if length <= 0:
+            return Response({"error": "Пустой кусок"}, status=status.HTTP_400_BAD_REQUEST)
+        if length > settings.CHAT_UPLOAD_MAX_CHUNK_SIZE:
+            return Response(
+                {"error": f"Кусок больше {settings.CHAT_UPLOAD_MAX_CHUNK_SIZE} байт"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        with transaction.atomic():
+            upload = self.get_object()
+
+            if upload.status != 'uploading':
+                return Response({"error": "Загрузка уже завершена"}, status=status.HTTP_409_CONFLICT)
+            # Клиент докачивает строго с того места, где остановился сервер
+            if offset != upload.received_bytes:
+                return Response(
+                    {"error": "Неверный offset", "received_bytes": upload.received_bytes},
+                    status=status.HTTP_409_CONFLICT
+                )
+            if offset + length > upload.total_size:
+                return Response({"error": "Кусок выходит за размер файла"}, status=status.HTTP_400_BAD_REQUEST)
+
+            digest = hashlib.sha256()
+            written = 0
+            with open(upload.temp_path, 'r+b') as fh:
+                # Отрезаем хвост от оборванной предыдущей попытки
+                fh.seek(offset)
+                fh.truncate()
+                while written < length:
+                    block = request.stream.read(min(STREAM_BLOCK_SIZE, length - written))
+                    if not block:
+                        break
+                    fh.write(block)
+                    digest.update(block)
+                    written += len(block)
+
+                expected = request.headers.get('X-Chunk-Checksum', '').lower()
+                if written != length or (expected and digest.hexdigest() != expected):
+                    fh.truncate(offset)
+                    return Response(
+                        {"error": "Кусок поврежден, отправьте его снова", "received_bytes": offset},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+            upload.received_bytes = offset + written
+            upload.save(update_fields=['received_bytes', 'updated_at'])
+
+        return Response({"received_bytes": upload.received_bytes})
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        with transaction.atomic():
+            upload = self.get_object()
+
+            if upload.status != 'uploading':
+                return Response({"error": "Загрузка уже завершена"}, status=status.HTTP_409_CONFLICT)
+            if upload.received_bytes != upload.total_size:
+                return Response(
+                    {"error": "Файл загружен не полностью", "received_bytes": upload.received_bytes},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            upload.status = 'processing'
+            upload.save(update_fields=['status', 'updated_at'])
+            transaction.on_commit(lambda: finalize_chat_upload.delay(str(upload.id)))
+
+        return Response(self.get_serializer(upload).data, status=status.HTTP_202_ACCEPTED)
@@ -23,16 +23,40 @@ app.conf.beat_schedule = {
 }
 
 app.conf.beat_schedule = {
-    # 1. "Гибкие напоминания": Запускаем каждую минуту.
+    # 1. "Гибкие напоминания": каждую минуту разбираем очередь ScheduledReminder.
     # Так мы поймаем и тех, кто хочет за 15 мин, и тех, кто за 24 часа.
     'check-flexible-reminders-every-minute': {
         'task': 'notifications.tasks.send_flexible_reminders',
         'schedule': 60.0, # 60 секунд
     },
 
-    # 2. "Повторы": Запускаем раз в день утром (например, в 9:00).
+    # 2. "Повторы": Каждый час — у каждого юзера свое утро (REPEAT_ALERT_HOUR в его часовом поясе).
     'check-repeating-events-daily': {
         'task': 'notifications.tasks.process_repeating_events',
-        'schedule': crontab(hour=9, minute=0),
+        'schedule': crontab(minute=0),
+    },
+
+    # 3. Сверка очереди напоминаний с событиями (ловит то, что прошло мимо сигналов).
+    'sync-reminder-queue-nightly': {
+        'task': 'notifications.tasks.sync_reminder_queue',
+        'schedule': crontab(hour=3, minute=30),
+    },
+
+    # 4. Архивация старых уведомлений (до сверки счетчиков).
+    'archive-notifications-nightly': {
+        'task': 'notifications.tasks.archive_notifications',
+        'schedule': crontab(hour=3, minute=40),
+    },
+
+    # 5. Сверка счетчиков непрочитанных с таблицей уведомлений.
+    'sync-unread-counters-nightly': {
+        'task': 'notifications.tasks.sync_unread_counters',
+        'schedule': crontab(hour=3, minute=45),
+    },
+
+    # 6. Доставки, зависшие в отправке (воркер упал посреди send_batch), — обратно в очередь.
+    'requeue-stalled-deliveries': {
+        'task': 'notifications.tasks.requeue_stalled_deliveries',
+        'schedule': 300.0,
     },
 }
\ No newline at end of file
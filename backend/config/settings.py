@@ -188,6 +188,13 @@ MEDIA_URL = '/media/'
 # Физическая папка на компьютере, куда будут падать файлы
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# === ЧАНКОВАЯ ЗАГРУЗКА ВЛОЖЕНИЙ ЧАТА ===
+# Куски пишутся во временную папку (не публичную), финализирует их Celery.
+# Папка должна быть общей у backend и celery_worker (в docker-compose — chat_uploads_volume).
+CHAT_UPLOAD_TEMP_DIR = os.getenv('CHAT_UPLOAD_TEMP_DIR', os.path.join(BASE_DIR, 'tmp', 'chat_uploads'))
+CHAT_UPLOAD_MAX_CHUNK_SIZE = int(os.getenv('CHAT_UPLOAD_MAX_CHUNK_SIZE', 5 * 1024 * 1024))  # 5 МБ
+CHAT_UPLOAD_MAX_FILE_SIZE = int(os.getenv('CHAT_UPLOAD_MAX_FILE_SIZE', 200 * 1024 * 1024))  # 200 МБ
+
 SIMPLE_JWT = {
     # Жизнь Access токена (с ним ходят за данными)
     'ACCESS_TOKEN_LIFETIME': timedelta(days=30), 
@@ -223,6 +230,98 @@ CHANNEL_LAYERS = {
     },
 }
 
+# === КЭШ ===
+# Отчеты биллинга и прочие вычисляемые данные
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": f"redis://{REDIS_HOST}:6379/3",
+    }
+}
+
+# === PRESENCE (онлайн-статус и "печатает...") ===
+# 'redis' в проде; 'memory' — для тестов и разработки без Redis (только один процесс)
+PRESENCE_STORE = os.getenv('PRESENCE_STORE', 'redis')
+PRESENCE_REDIS_URL = f"redis://{REDIS_HOST}:6379/2"
+PRESENCE_TTL = 60  # сек: без heartbeat дольше этого юзер считается оффлайн
+TYPING_THROTTLE = 3  # сек: не чаще одного события "печатает" на юзера в комнате
+
+# === НАПОМИНАНИЯ ===
+# Сколько строк ScheduledReminder воркер забирает за одну транзакцию
+REMINDER_BATCH_SIZE = 500
+
+# Местный час (по NotificationSettings.timezone), с которого приходят напоминания о повторах
+REPEAT_ALERT_HOUR = 9
+
+# === ДОСТАВКА УВЕДОМЛЕНИЙ ===
+# Каналы подключаются здесь; у каждого своя очередь Celery, чтобы медленный провайдер
+# не задерживал остальные. Воркер: celery -A config worker -Q celery,notifications.websocket,...
+NOTIFICATION_CHANNELS = {
+    'websocket': {
+        'BACKEND': 'notifications.delivery.WebSocketChannel',
+        'QUEUE': 'notifications.websocket',
+    },
+    'push': {
+        # Без PUSH_PROVIDER_URL пуши только печатаются в лог воркера
+        'BACKEND': 'notifications.delivery.HttpPushChannel' if os.getenv('PUSH_PROVIDER_URL') else 'notifications.delivery.FakePushChannel',
+        'QUEUE': 'notifications.push',
+    },
+    'email': {
+        'BACKEND': 'notifications.delivery.EmailChannel',
+        'QUEUE': 'notifications.email',
+    },
+}
+PUSH_PROVIDER_URL = os.getenv('PUSH_PROVIDER_URL', '')
+PUSH_PROVIDER_TOKEN = os.getenv('PUSH_PROVIDER_TOKEN', '')
+PUSH_PROVIDER_TIMEOUT = 10  # сек
+NOTIFICATION_DELIVERY_BATCH_SIZE = 200
+NOTIFICATION_DELIVERY_MAX_ATTEMPTS = 5
+NOTIFICATION_DELIVERY_RETRY_DELAY = 30  # сек, удваивается с каждой попыткой
+NOTIFICATION_DELIVERY_CLAIM_TIMEOUT = 600  # сек; дольше в sending — воркер умер, строка снова pending
+
+# === ХРАНЕНИЕ УВЕДОМЛЕНИЙ ===
+# Старше срока — в NotificationArchive (ночная задача archive_notifications)
+NOTIFICATION_READ_TTL_DAYS = int(os.getenv('NOTIFICATION_READ_TTL_DAYS', 90))  # прочитанные
+NOTIFICATION_TTL_DAYS = int(os.getenv('NOTIFICATION_TTL_DAYS', 365))  # любые, включая непрочитанные
+NOTIFICATION_ARCHIVE_BATCH_SIZE = 5000
+
+# === СКЛАД ===
+# False — оплата счета не проходит, если товара на складе меньше, чем в счете
+BILLING_ALLOW_NEGATIVE_STOCK = os.getenv('BILLING_ALLOW_NEGATIVE_STOCK') == 'True'
+
+# === ОТЧЕТЫ ===
+# Сколько живет в кэше отчет, в который еще попадают новые оплаты (закрытые периоды — сутки)
+BILLING_REPORT_CACHE_TTL = 300
+BILLING_REPORT_CLOSED_CACHE_TTL = 60 * 60 * 24
+
+# === КАТАЛОГ ===
+# Автокомплит в счете: запрос на каждое нажатие, одинаковые префиксы отдаем из кэша
+CATALOG_AUTOCOMPLETE_CACHE_TTL = 60
+CATALOG_AUTOCOMPLETE_LIMIT = 20
+
+# === PDF СЧЕТОВ ===
+# Рендер локально (reportlab), файлы — в MEDIA_ROOT/invoices/<id>/, версия = updated_at
+INVOICE_PDF_FONT = os.getenv('INVOICE_PDF_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+# Больше счетов за раз zip-экспорт не собирает — пусть сузят период
+INVOICE_EXPORT_MAX_INVOICES = 1000
+
+# === РАЗВЕДЕНИЕ ===
+# Прогноз течки: средний интервал по последним N циклам; при одном цикле — интервал по умолчанию
+HEAT_PREDICTION_WINDOW = 4
+HEAT_CYCLE_DEFAULT_DAYS = 180
+# Кэш сбрасывается сигналом при изменении HeatCycle; TTL — на случай смены владельца/пола питомца
+HEAT_PREDICTION_CACHE_TTL = 60 * 60 * 24
+# Сводка питомника (пометы/вязки); сбрасывается сигналами при записи Litter/Mating
+BREEDING_DASHBOARD_CACHE_TTL = 60 * 60
+# Подбор пары: COI считаем на 5 поколений, выше 6.25% (уровень двоюродных) — не предлагаем
+PAIRING_COI_GENERATIONS = 5
+PAIRING_MAX_COI = 0.0625
+PAIRING_SIRE_MIN_AGE_MONTHS = 12
+PAIRING_SIRE_MAX_AGE_YEARS = 10
+PAIRING_REST_DAYS = 14  # с последней вязки кобеля
+PAIRING_TOP_K = 10
+PAIRING_POOL_CACHE_TTL = 15 * 60  # пул кандидатов породы
+
 gettext = lambda s: s
 LANGUAGES = (
     ('ru', gettext('Russian')),
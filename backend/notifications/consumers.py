@@ -1,7 +1,8 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
+from chat.presence import PresenceMixin
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+class NotificationConsumer(PresenceMixin, AsyncWebsocketConsumer):
     async def connect(self):
         # 1. Получаем пользователя из scope (об этом ниже, в Middleware)
         self.user = self.scope.get("user")
@@ -20,15 +21,27 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             )
 
             await self.accept()
+            # Открытое приложение (колокольчик) = пользователь онлайн
+            await self.presence_connect()
 
     async def disconnect(self, close_code):
+        await self.presence_disconnect()
         if hasattr(self, 'group_name'):
             await self.channel_layer.group_discard(
                 self.group_name,
                 self.channel_name
             )
 
+    async def receive(self, text_data):
+        # Единственный входящий кадр здесь — heartbeat для онлайн-статуса
+        if json.loads(text_data).get('type') == 'heartbeat':
+            await self.presence_heartbeat()
+
     # Метод, который будет вызываться, когда мы шлем сообщение из кода (сигнала)
     async def send_notification(self, event):
         # Отправляем JSON клиенту (в мобилку или браузер)
-        await self.send(text_data=json.dumps(event["data"]))
\ No newline at end of file
+        await self.send(text_data=json.dumps(event["data"]))
+
+    # Новое значение счетчика непрочитанных (notifications.counters)
+    async def unread_count(self, event):
+        await self.send(text_data=json.dumps({'type': 'unread_count', 'count': event['count']}))
\ No newline at end of file
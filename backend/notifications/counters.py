@@ -0,0 +1,112 @@
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import connection, transaction
+
+from .models import Notification, UnreadCounter
+
+logger = logging.getLogger(__name__)
+
+# Атомарный сдвиг счетчиков пачкой. Строки еще нет — заводим ее с фактическим числом
+# из таблицы (изменение в ней уже видно), есть — count + delta.
+BUMP_UNREAD_SQL = """
+    WITH deltas (user_id, delta) AS (
+        VALUES {values}
+    ),
+    seeded AS (
+        INSERT INTO notifications_unreadcounter (user_id, count)
+        SELECT d.user_id, (
+            SELECT COUNT(*) FROM notifications_notification n
+            WHERE n.recipient_id = d.user_id AND NOT n.is_read
+        )
+        FROM deltas d
+        WHERE NOT EXISTS (SELECT 1 FROM notifications_unreadcounter c WHERE c.user_id = d.user_id)
+        ON CONFLICT (user_id) DO NOTHING
+        RETURNING user_id, count
+    ),
+    bumped AS (
+        UPDATE notifications_unreadcounter c
+        SET count = GREATEST(c.count + d.delta, 0)
+        FROM deltas d
+        WHERE c.user_id = d.user_id
+        RETURNING c.user_id, c.count
+    )
+    SELECT user_id, count FROM seeded
+    UNION ALL
+    SELECT user_id, count FROM bumped
+"""
+
+# Сверка с таблицей: считает по частичному индексу notif_unread_recipient_idx
+RECONCILE_UNREAD_SQL = """
+    WITH actual AS (
+        SELECT recipient_id AS user_id, COUNT(*) AS count
+        FROM notifications_notification
+        WHERE NOT is_read
+        GROUP BY recipient_id
+    )
+    INSERT INTO notifications_unreadcounter (user_id, count)
+    SELECT user_id, count FROM actual
+    ON CONFLICT (user_id) DO UPDATE SET count = EXCLUDED.count
+    WHERE notifications_unreadcounter.count <> EXCLUDED.count
+"""
+
+RESET_STALE_UNREAD_SQL = """
+    UPDATE notifications_unreadcounter c
+    SET count = 0
+    WHERE c.count <> 0 AND NOT EXISTS (
+        SELECT 1 FROM notifications_notification n
+        WHERE n.recipient_id = c.user_id AND NOT n.is_read
+    )
+"""
+
+
+def bump_unread(deltas):
+    """
+    deltas — {user_id: +N / -N}. Меняет счетчики одним запросом
+    и после коммита рассылает новые значения в user_<id>.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return {}
+
+    params = []
+    for user_id, delta in deltas.items():
+        params += [user_id, delta]
+    values = ", ".join(["(%s::bigint, %s::integer)"] * len(deltas))
+    with connection.cursor() as cursor:
+        cursor.execute(BUMP_UNREAD_SQL.format(values=values), params)
+        counts = dict(cursor.fetchall())
+
+    transaction.on_commit(lambda: push_unread_counts(counts))
+    return counts
+
+
+def get_unread_count(user_id):
+    """Значение счетчика; если строки еще нет — считаем один раз и сохраняем."""
+    counter = UnreadCounter.objects.filter(user_id=user_id).values_list('count', flat=True).first()
+    if counter is not None:
+        return counter
+    count = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+    UnreadCounter.objects.get_or_create(user_id=user_id, defaults={'count': count})
+    return count
+
+
+def push_unread_counts(counts):
+    """Новое значение колокольчика — в NotificationConsumer / MultiplexConsumer, без поллинга."""
+    channel_layer = get_channel_layer()
+
+    async def send_all():
+        for user_id, count in counts.items():
+            try:
+                await channel_layer.group_send(f"user_{user_id}", {"type": "unread_count", "count": count})
+            except Exception:
+                logger.exception("unread count push failed for user %s", user_id)
+
+    async_to_sync(send_all)()
+
+
+def reconcile_unread_counters():
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(RECONCILE_UNREAD_SQL)
+        cursor.execute(RESET_STALE_UNREAD_SQL)
@@ -0,0 +1,190 @@
+import logging
+
+import requests
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import NotificationSettings
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryChannel:
+    """
+    Канал доставки уведомлений.
+    Конкретные каналы подключаются через settings.NOTIFICATION_CHANNELS.
+    """
+    name = None
+
+    def is_enabled(self, user_settings):
+        """Включен ли канал в личных настройках юзера."""
+        raise NotImplementedError
+
+    def send_batch(self, deliveries):
+        """
+        Отправка пачки NotificationDelivery (с подгруженными notification и recipient).
+        Возвращает {delivery_id: текст ошибки} для неудачных; остальные считаются доставленными.
+        """
+        raise NotImplementedError
+
+
+class WebSocketChannel(DeliveryChannel):
+    """Колокольчик в браузере: group_send в user_<id>, вся пачка за один async_to_sync."""
+    name = 'websocket'
+
+    def is_enabled(self, user_settings):
+        return user_settings.browser_enabled
+
+    def send_batch(self, deliveries):
+        from .services import websocket_message
+
+        sound_by_user = dict(
+            NotificationSettings.objects.filter(
+                user_id__in={d.notification.recipient_id for d in deliveries}
+            ).values_list('user_id', 'sound_enabled')
+        )
+        messages = [
+            (
+                d.id,
+                f"user_{d.notification.recipient_id}",
+                websocket_message(d.notification, sound_by_user.get(d.notification.recipient_id, True)),
+            )
+            for d in deliveries
+        ]
+        channel_layer = get_channel_layer()
+        errors = {}
+
+        async def send_all():
+            for delivery_id, group_name, message in messages:
+                try:
+                    await channel_layer.group_send(group_name, message)
+                except Exception as e:
+                    errors[delivery_id] = str(e)
+
+        async_to_sync(send_all)()
+        return errors
+
+
+class EmailChannel(DeliveryChannel):
+    """Email: одно SMTP-соединение на всю пачку."""
+    name = 'email'
+
+    def is_enabled(self, user_settings):
+        return user_settings.email_enabled
+
+    def send_batch(self, deliveries):
+        errors = {}
+        with get_connection() as connection:
+            for d in deliveries:
+                notification = d.notification
+                if not notification.recipient.email:
+                    errors[d.id] = "У получателя нет email"
+                    continue
+                link = (notification.metadata or {}).get('link')
+                body = notification.message
+                if link:
+                    body += f"\n\n{settings.FRONTEND_URL}{link}"
+                message = EmailMessage(
+                    subject=notification.title,
+                    body=body,
+                    to=[notification.recipient.email],
+                    connection=connection,
+                )
+                try:
+                    message.send()
+                except Exception as e:
+                    errors[d.id] = str(e)
+        return errors
+
+
+class HttpPushChannel(DeliveryChannel):
+    """
+    Мобильный пуш через HTTP-провайдера (FCM/OneSignal-подобный API).
+    Одинаковые уведомления (fan-out одного события) уходят одним multicast-запросом.
+    """
+    name = 'push'
+
+    def is_enabled(self, user_settings):
+        return user_settings.push_enabled
+
+    def send_batch(self, deliveries):
+        groups = {}
+        for d in deliveries:
+            n = d.notification
+            key = (n.title, n.message, (n.metadata or {}).get('link'))
+            groups.setdefault(key, []).append(d)
+
+        errors = {}
+        for (title, message, link), group in groups.items():
+            payload = {
+                'user_ids': [d.notification.recipient_id for d in group],
+                'title': title,
+                'body': message,
+                'data': {'link': link, 'notification_ids': [d.notification_id for d in group]},
+            }
+            try:
+                self.post(payload)
+            except Exception as e:
+                errors.update({d.id: str(e) for d in group})
+        return errors
+
+    def post(self, payload):
+        response = requests.post(
+            settings.PUSH_PROVIDER_URL,
+            json=payload,
+            headers={'Authorization': f"Bearer {settings.PUSH_PROVIDER_TOKEN}"},
+            timeout=settings.PUSH_PROVIDER_TIMEOUT,
+        )
+        response.raise_for_status()
+
+
+class FakePushChannel(HttpPushChannel):
+    """Локальная замена провайдера: ничего не отправляет, только пишет multicast-запрос в лог."""
+
+    def post(self, payload):
+        logger.info("fake push: %d recipients: %s", len(payload['user_ids']), payload['title'])
+
+
+_channels = None
+
+
+def get_channels():
+    """{name: экземпляр канала} из settings.NOTIFICATION_CHANNELS."""
+    global _channels
+    if _channels is None:
+        _channels = {}
+        for name, config in settings.NOTIFICATION_CHANNELS.items():
+            channel = import_string(config['BACKEND'])()
+            channel.name = name
+            _channels[name] = channel
+    return _channels
+
+
+def get_channel(name):
+    return get_channels()[name]
+
+
+def enqueue_deliveries(deliveries):
+    """
+    Ставит отправку созданных NotificationDelivery в очереди их каналов (после коммита).
+    Одна задача — одна пачка не больше NOTIFICATION_DELIVERY_BATCH_SIZE.
+    """
+    from .tasks import deliver_notifications
+
+    ids_by_channel = {}
+    for d in deliveries:
+        ids_by_channel.setdefault(d.channel, []).append(d.id)
+
+    batch_size = settings.NOTIFICATION_DELIVERY_BATCH_SIZE
+    for channel, ids in ids_by_channel.items():
+        queue = settings.NOTIFICATION_CHANNELS[channel]['QUEUE']
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            transaction.on_commit(
+                lambda channel=channel, chunk=chunk, queue=queue:
+                    deliver_notifications.apply_async((channel, chunk), queue=queue)
+            )
@@ -0,0 +1,81 @@
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import connection
+
+from .counters import bump_unread
+from .models import Notification
+
+# Одна строка на (получатель, питомец, категория, окно): первое событие окна вставляет уведомление,
+# следующие сворачиваются в него — счетчик, список событий, текст и ссылка последнего.
+# WHERE в DO UPDATE не дает повтору задачи посчитать то же событие дважды.
+UPSERT_DIGEST_SQL = """
+    INSERT INTO notifications_notification (
+        recipient_id, category, title, message, content_type_id, object_id,
+        is_read, metadata, created_at, dedup_key, group_count
+    )
+    VALUES {values}
+    ON CONFLICT (recipient_id, dedup_key) DO UPDATE SET
+        group_count = notifications_notification.group_count + 1,
+        title = %s || ' (' || (notifications_notification.group_count + 1) || ')',
+        message = EXCLUDED.title,
+        object_id = EXCLUDED.object_id,
+        is_read = FALSE,
+        metadata = COALESCE(notifications_notification.metadata, '{{}}'::jsonb) || jsonb_build_object(
+            'event_id', EXCLUDED.metadata->'event_id',
+            'event_ids', COALESCE(notifications_notification.metadata->'event_ids', '[]'::jsonb)
+                         || (EXCLUDED.metadata->'event_ids'),
+            'link', EXCLUDED.metadata->'link',
+            'is_digest', TRUE
+        )
+    WHERE NOT COALESCE(notifications_notification.metadata->'event_ids', '[]'::jsonb)
+              @> (EXCLUDED.metadata->'event_ids')
+    RETURNING id, group_count, recipient_id, dedup_key
+"""
+
+
+def digest_bucket(now, window_minutes):
+    """Начало и конец окна группировки, выровненные по эпохе (одинаковые у всех воркеров)."""
+    window = window_minutes * 60
+    start = int(now.timestamp()) // window * window
+    start_dt = datetime.fromtimestamp(start, tz=dt_timezone.utc)
+    return start_dt, start_dt + timedelta(seconds=window)
+
+
+def upsert_digests(notifications, digest_title):
+    """
+    Вставка/свертка уведомлений с dedup_key вида digest:<pet>:<category>:<начало окна>.
+    digest_title — заголовок свернутой строки (к нему дописывается счетчик).
+    Возвращает (id вставленных, id строк, впервые ставших дайджестом).
+    """
+    if not notifications:
+        return [], []
+
+    row = "(%s, %s, %s, %s, %s, %s, FALSE, %s::jsonb, %s, %s, 1)"
+    params = []
+    for n in notifications:
+        params += [
+            n.recipient_id, n.category, n.title, n.message, n.content_type_id, n.object_id,
+            json.dumps(n.metadata), n.created_at, n.dedup_key,
+        ]
+    params.append(digest_title)
+
+    # Свертка в уже прочитанный дайджест снова делает его непрочитанным — это +1 к счетчику
+    already_read = set(Notification.objects.filter(
+        recipient_id__in={n.recipient_id for n in notifications},
+        dedup_key__in={n.dedup_key for n in notifications},
+        is_read=True
+    ).values_list('recipient_id', 'dedup_key'))
+
+    with connection.cursor() as cursor:
+        cursor.execute(UPSERT_DIGEST_SQL.format(values=", ".join([row] * len(notifications))), params)
+        rows = cursor.fetchall()
+
+    bump_unread({
+        recipient_id: 1
+        for _, count, recipient_id, dedup_key in rows
+        if count == 1 or (recipient_id, dedup_key) in already_read
+    })
+    inserted = [notification_id for notification_id, count, _, _ in rows if count == 1]
+    became_digest = [notification_id for notification_id, count, _, _ in rows if count == 2]
+    return inserted, became_digest
@@ -0,0 +1,47 @@
+import gzip
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from notifications.models import NotificationArchive
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка архива уведомлений в JSONL (gzip) с опциональным удалением выгруженного'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Файл .jsonl.gz')
+        parser.add_argument('--before', required=True, help='Уведомления, созданные до даты (YYYY-MM-DD)')
+        parser.add_argument('--delete', action='store_true', help='Удалить выгруженные строки из архива')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            before = timezone.make_aware(datetime.strptime(options['before'], '%Y-%m-%d'))
+        except ValueError:
+            raise CommandError("--before ожидает дату в формате YYYY-MM-DD")
+
+        rows = NotificationArchive.objects.filter(created_at__lt=before).order_by('id')
+        exported = 0
+        last_id = None
+
+        # Потоково: iterator() не держит весь архив в памяти
+        with gzip.open(options['output'], 'wt', encoding='utf-8') as fh:
+            for row in rows.values('id', 'recipient_id', 'category', 'created_at', 'archived_at', 'payload').iterator(
+                chunk_size=options['chunk_size']
+            ):
+                fh.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+                exported += 1
+                last_id = row['id']
+
+        self.stdout.write(f"Выгружено: {exported} -> {options['output']}")
+
+        if options['delete'] and last_id is not None:
+            # Удаляем только то, что точно попало в файл
+            with transaction.atomic():
+                deleted, _ = rows.filter(id__lte=last_id).delete()
+            self.stdout.write(f"Удалено из архива: {deleted}")
@@ -0,0 +1,70 @@
+# Generated by Django 6.0 on 2026-10-19 14:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Первичное заполнение очереди для уже запланированных событий.
+# Строки, чей момент отправки уже прошел, сразу помечаются отправленными: их разослал старый
+# send_flexible_reminders, а ключ дедупликации у новой очереди другой — дубль бы не отсекся.
+# Замороженная копия SYNC_REMINDERS_SQL из notifications.reminders на момент миграции
+# (1440 — тогдашний дефолт reminder_time_minutes): живой модуль потом может измениться.
+FILL_REMINDER_QUEUE_SQL = """
+    WITH events AS (
+        SELECT e.id, e.date, e.pet_id
+        FROM pets_petevent e
+        WHERE e.status = 'planned' AND e.date > NOW()
+    ),
+    recipients AS (
+        SELECT p.id AS pet_id, p.owner_id AS user_id
+        FROM pets_pet p
+        WHERE p.owner_id IS NOT NULL AND p.id IN (SELECT pet_id FROM events)
+        UNION
+        SELECT a.pet_id, a.user_id
+        FROM pets_petaccess a
+        WHERE a.is_active AND a.pet_id IN (SELECT pet_id FROM events)
+    ),
+    pairs AS (
+        SELECT e.id AS event_id, r.user_id,
+               COALESCE(s.reminder_time_minutes, 1440) AS minutes, e.date
+        FROM events e
+        JOIN recipients r ON r.pet_id = e.pet_id
+        LEFT JOIN notifications_notificationsettings s ON s.user_id = r.user_id
+    ),
+    slots AS (
+        SELECT event_id, user_id, minutes, date - minutes * INTERVAL '1 minute' AS fire_at
+        FROM pairs
+    )
+    INSERT INTO notifications_scheduledreminder (event_id, user_id, minutes, fire_at, sent_at)
+    SELECT event_id, user_id, minutes, fire_at, CASE WHEN fire_at <= NOW() THEN NOW() END
+    FROM slots
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_notification_dedup_key'),
+        ('pets', '0007_petevent_status_date_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minutes', models.PositiveIntegerField(verbose_name='За сколько минут')),
+                ('fire_at', models.DateTimeField(verbose_name='Когда отправить')),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_reminders', to='pets.petevent')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_reminders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('sent_at__isnull', True)), fields=['fire_at'], name='sched_reminder_pending_idx')],
+                'constraints': [models.UniqueConstraint(fields=('event', 'user'), name='sched_reminder_event_user_uniq')],
+            },
+        ),
+        migrations.RunSQL(FILL_REMINDER_QUEUE_SQL, migrations.RunSQL.noop),
+    ]
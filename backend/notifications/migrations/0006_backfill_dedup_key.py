@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-19 14:50
+
+from django.db import migrations
+
+# Перенос старых ключей дедупликации из metadata->>'trigger' в колонку dedup_key.
+# timer_<m> был уникален только вместе с объектом — дописываем object_id.
+# Если в истории уже есть дубли, ключ получает только самая ранняя строка.
+BACKFILL_SQL = r"""
+    WITH keyed AS (
+        SELECT id, recipient_id,
+               CASE WHEN metadata->>'trigger' LIKE 'timer\_%'
+                    THEN (metadata->>'trigger') || ':' || object_id
+                    ELSE metadata->>'trigger'
+               END AS key
+        FROM notifications_notification
+        WHERE dedup_key IS NULL AND metadata->>'trigger' IS NOT NULL
+    ),
+    ranked AS (
+        SELECT id, recipient_id, key,
+               row_number() OVER (PARTITION BY recipient_id, key ORDER BY id) AS rn
+        FROM keyed
+    )
+    UPDATE notifications_notification n
+    SET dedup_key = r.key
+    FROM ranked r
+    WHERE n.id = r.id AND r.rn = 1
+      AND NOT EXISTS (
+          SELECT 1 FROM notifications_notification x
+          WHERE x.recipient_id = r.recipient_id AND x.dedup_key = r.key
+      )
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_scheduledreminder'),
+    ]
+
+    operations = [
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
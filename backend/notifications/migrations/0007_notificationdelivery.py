@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-19 14:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_backfill_dedup_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(max_length=20, verbose_name='Канал')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('sent', 'Доставлено'), ('failed', 'Ошибка')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='notifications.notification')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['channel', 'status', 'created_at'], name='notif_delivery_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('notification', 'channel'), name='notif_delivery_channel_uniq')],
+            },
+        ),
+    ]
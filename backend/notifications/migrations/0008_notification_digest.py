@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-19 14:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0007_notificationdelivery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='group_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='notificationsettings',
+            name='digest_window_minutes',
+            field=models.PositiveIntegerField(choices=[(0, 'Без группировки'), (5, 'За 5 минут'), (15, 'За 15 минут'), (60, 'За 1 час')], default=15, verbose_name='Окно группировки событий'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-19 14:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Стартовые значения счетчиков: без строки первый bump_unread начал бы с нуля
+SEED_COUNTERS_SQL = """
+    INSERT INTO notifications_unreadcounter (user_id, count)
+    SELECT recipient_id, COUNT(*)
+    FROM notifications_notification
+    WHERE NOT is_read
+    GROUP BY recipient_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('notifications', '0008_notification_digest'),
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['recipient'], name='notif_unread_recipient_idx'),
+        ),
+        migrations.RunSQL(SEED_COUNTERS_SQL, migrations.RunSQL.noop),
+    ]
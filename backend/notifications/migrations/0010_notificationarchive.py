@@ -0,0 +1,59 @@
+# Generated by Django 6.0 on 2026-10-19 14:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Архив читается редко: lz4 сжимает payload быстрее pglz по умолчанию.
+# Только если сервер собран с lz4 (PostgreSQL 14+), иначе остается pglz.
+SET_LZ4_SQL = """
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM pg_settings
+            WHERE name = 'default_toast_compression' AND 'lz4' = ANY(enumvals)
+        ) THEN
+            ALTER TABLE notifications_notificationarchive ALTER COLUMN payload SET COMPRESSION lz4;
+        END IF;
+    END $$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('notifications', '0009_unreadcounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('category', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField()),
+                ('payload', models.JSONField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['created_at'], name='notif_created_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificationarchive',
+            name='recipient',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='notificationarchive',
+            index=models.Index(fields=['recipient', 'created_at'], name='notif_archive_recipient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationarchive',
+            index=models.Index(fields=['archived_at'], name='notif_archive_archived_idx'),
+        ),
+        migrations.RunSQL(SET_LZ4_SQL, migrations.RunSQL.noop),
+    ]
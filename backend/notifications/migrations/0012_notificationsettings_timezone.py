@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0011_notification_feed_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationsettings',
+            name='timezone',
+            field=models.CharField(default='UTC', max_length=64, verbose_name='Часовой пояс'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-19 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0012_notificationsettings_timezone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationdelivery',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='notificationdelivery',
+            name='status',
+            field=models.CharField(choices=[('pending', 'В очереди'), ('sending', 'Отправляется'), ('sent', 'Доставлено'), ('failed', 'Ошибка')], default='pending', max_length=10),
+        ),
+    ]
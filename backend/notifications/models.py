@@ -29,6 +29,131 @@ class Notification(models.Model):
     metadata = models.JSONField(default=dict, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Ключ идемпотентности: не больше одного уведомления на (получатель, ключ).
+    # NULL — уведомление без дедупликации.
+    dedup_key = models.CharField(max_length=100, null=True, blank=True)
+    # Сколько событий свернуто в эту строку (дайджест). 1 — обычное уведомление
+    group_count = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recipient', 'dedup_key'], name='notif_recipient_dedup_key_uniq'),
+        ]
+        indexes = [
+            # Только непрочитанные: пересчет счетчиков не читает всю историю
+            models.Index(fields=['recipient'], name='notif_unread_recipient_idx', condition=models.Q(is_read=False)),
+            # Отбор строк под архивацию по возрасту
+            models.Index(fields=['created_at'], name='notif_created_at_idx'),
+            # Лента колокольчика: keyset-пагинация (-created_at, -id) в пределах получателя
+            models.Index(fields=['recipient', '-created_at', '-id'], name='notif_recipient_feed_idx'),
+        ]
+
+class NotificationArchive(models.Model):
+    """
+    Холодный архив уведомлений старше срока хранения (notifications.retention).
+    Все, кроме полей для поиска, свернуто в payload (JSONB со сжатием lz4).
+    id совпадает с исходным уведомлением.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    # Без FK в БД: архив не тормозит удаление/изменение пользователей, каскад — на уровне Django
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name='+'
+    )
+    category = models.CharField(max_length=20)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+    payload = models.JSONField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', 'created_at'], name='notif_archive_recipient_idx'),
+            models.Index(fields=['archived_at'], name='notif_archive_archived_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived {self.id} -> {self.recipient_id}"
+
+class UnreadCounter(models.Model):
+    """
+    Число непрочитанных уведомлений юзера (колокольчик) без COUNT(*) на каждый запрос.
+    Меняется атомарно в notifications.counters, сверяется с таблицей reconcile_unread_counters.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='unread_counter'
+    )
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Unread {self.user_id}: {self.count}"
+
+class NotificationDelivery(models.Model):
+    """
+    Статус доставки уведомления по одному каналу (websocket / push / email).
+    Строки создает маршрутизатор, отправляет — deliver_notifications в очереди своего канала.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('sending', 'Отправляется'),
+        ('sent', 'Доставлено'),
+        ('failed', 'Ошибка'),
+    ]
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='deliveries')
+    channel = models.CharField(max_length=20, verbose_name="Канал")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    # Когда воркер забрал строку в отправку; зависшие в sending дольше таймаута возвращаются в очередь
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['notification', 'channel'], name='notif_delivery_channel_uniq'),
+        ]
+        indexes = [
+            # Пропускная способность и хвосты очереди по каналу
+            models.Index(fields=['channel', 'status', 'created_at'], name='notif_delivery_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel}:{self.notification_id} ({self.status})"
+
+class ScheduledReminder(models.Model):
+    """
+    Очередь напоминаний: одна строка на пару (событие, получатель) с заранее
+    посчитанным моментом отправки. Поддерживается сигналами (notifications.reminders),
+    разбирается воркером send_flexible_reminders через SKIP LOCKED.
+    """
+    event = models.ForeignKey('pets.PetEvent', on_delete=models.CASCADE, related_name='scheduled_reminders')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='scheduled_reminders')
+    minutes = models.PositiveIntegerField(verbose_name="За сколько минут")
+    fire_at = models.DateTimeField(verbose_name="Когда отправить")
+    # NULL — еще не отправлено. Заполняется в той же транзакции, что и уведомление
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'user'], name='sched_reminder_event_user_uniq'),
+        ]
+        indexes = [
+            # Воркер читает только неотправленные — индекс не растет от истории
+            models.Index(
+                fields=['fire_at'],
+                name='sched_reminder_pending_idx',
+                condition=models.Q(sent_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"Reminder {self.event_id} -> {self.user_id} at {self.fire_at}"
+
 class NotificationSettings(models.Model):
     """
     Личные настройки уведомлений пользователя.
@@ -64,5 +189,21 @@ class NotificationSettings(models.Model):
         verbose_name="За сколько напоминать"
     )
 
+    # Группировка событий одного питомца и категории в одно уведомление
+    DIGEST_CHOICES = [
+        (0, 'Без группировки'),
+        (5, 'За 5 минут'),
+        (15, 'За 15 минут'),
+        (60, 'За 1 час'),
+    ]
+    digest_window_minutes = models.PositiveIntegerField(
+        choices=DIGEST_CHOICES,
+        default=15,
+        verbose_name="Окно группировки событий"
+    )
+
+    # IANA-имя (Europe/Moscow): "сегодня" и "утро" для ежедневных напоминаний — по местному времени
+    timezone = models.CharField(max_length=64, default='UTC', verbose_name="Часовой пояс")
+
     def __str__(self):
         return f"Settings for {self.user}"
\ No newline at end of file
@@ -0,0 +1,90 @@
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import NotificationSettings
+
+# Пересчет очереди напоминаний для набора событий и/или пользователей.
+# Получатели: владелец питомца + активные доступы. Время — из личных настроек (или дефолт).
+# Неотправленные строки области пересобираются; отправленные трогаем,
+# только если момент отправки сдвинулся (событие перенесли или поменяли настройку).
+SYNC_REMINDERS_SQL = """
+    WITH events AS (
+        SELECT e.id, e.date, e.pet_id
+        FROM pets_petevent e
+        WHERE e.status = 'planned' AND e.date > %(now)s {event_filter}
+    ),
+    recipients AS (
+        SELECT p.id AS pet_id, p.owner_id AS user_id
+        FROM pets_pet p
+        WHERE p.owner_id IS NOT NULL AND p.id IN (SELECT pet_id FROM events)
+        UNION
+        SELECT a.pet_id, a.user_id
+        FROM pets_petaccess a
+        WHERE a.is_active AND a.pet_id IN (SELECT pet_id FROM events)
+    ),
+    pairs AS (
+        SELECT e.id AS event_id, r.user_id,
+               COALESCE(s.reminder_time_minutes, %(default_minutes)s) AS minutes, e.date
+        FROM events e
+        JOIN recipients r ON r.pet_id = e.pet_id
+        LEFT JOIN notifications_notificationsettings s ON s.user_id = r.user_id
+        WHERE TRUE {user_filter}
+    )
+    INSERT INTO notifications_scheduledreminder (event_id, user_id, minutes, fire_at, sent_at)
+    SELECT event_id, user_id, minutes, date - minutes * INTERVAL '1 minute', NULL
+    FROM pairs
+    ON CONFLICT (event_id, user_id) DO UPDATE SET
+        minutes = EXCLUDED.minutes,
+        fire_at = EXCLUDED.fire_at,
+        sent_at = CASE
+            WHEN notifications_scheduledreminder.fire_at = EXCLUDED.fire_at
+            THEN notifications_scheduledreminder.sent_at
+        END
+"""
+
+DELETE_PENDING_SQL = """
+    DELETE FROM notifications_scheduledreminder r
+    WHERE r.sent_at IS NULL {scope}
+"""
+
+
+def _sync(event_ids=None, user_ids=None):
+    params = {
+        'now': timezone.now(),
+        'default_minutes': NotificationSettings._meta.get_field('reminder_time_minutes').default,
+        'event_ids': list(event_ids or []),
+        'user_ids': list(user_ids or []),
+    }
+    event_filter = 'AND e.id = ANY(%(event_ids)s)' if event_ids is not None else ''
+    user_filter = 'AND r.user_id = ANY(%(user_ids)s)' if user_ids is not None else ''
+    scope = ''
+    if event_ids is not None:
+        scope += ' AND r.event_id = ANY(%(event_ids)s)'
+    if user_ids is not None:
+        scope += ' AND r.user_id = ANY(%(user_ids)s)'
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Строку, которую сейчас держит воркер, DELETE дождется и пропустит (sent_at уже заполнен)
+        cursor.execute(DELETE_PENDING_SQL.format(scope=scope), params)
+        cursor.execute(SYNC_REMINDERS_SQL.format(event_filter=event_filter, user_filter=user_filter), params)
+
+
+def sync_event_reminders(event_ids):
+    """Пересчитать напоминания по событиям (создание, перенос, смена статуса)."""
+    _sync(event_ids=event_ids)
+
+
+def sync_pet_reminders(pet_id):
+    """Пересчитать напоминания по всем событиям питомца (смена владельца, доступы)."""
+    from pets.models import PetEvent
+    _sync(event_ids=PetEvent.objects.filter(pet_id=pet_id).values_list('id', flat=True))
+
+
+def sync_user_reminders(user_id):
+    """Пересчитать напоминания юзера (поменял reminder_time_minutes)."""
+    _sync(user_ids=[user_id])
+
+
+def sync_all_reminders():
+    """Полная пересборка очереди (первичное заполнение, ручной ремонт)."""
+    _sync()
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .counters import bump_unread
+
+# Перенос одной пачки в архив одним запросом: отбор (SKIP LOCKED) -> удаление статусов доставки
+# -> удаление уведомлений -> вставка в архив. Возвращает, сколько непрочитанных ушло у каждого юзера.
+ARCHIVE_BATCH_SQL = """
+    WITH batch AS (
+        SELECT id FROM notifications_notification
+        WHERE (is_read AND created_at < %(read_before)s) OR created_at < %(any_before)s
+        ORDER BY id
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    ),
+    dropped_deliveries AS (
+        DELETE FROM notifications_notificationdelivery
+        WHERE notification_id IN (SELECT id FROM batch)
+    ),
+    moved AS (
+        DELETE FROM notifications_notification n
+        USING batch b
+        WHERE n.id = b.id
+        RETURNING n.*
+    ),
+    archived AS (
+        INSERT INTO notifications_notificationarchive (id, recipient_id, category, created_at, archived_at, payload)
+        SELECT id, recipient_id, category, created_at, %(now)s, jsonb_build_object(
+            'title', title,
+            'message', message,
+            'is_read', is_read,
+            'metadata', metadata,
+            'content_type_id', content_type_id,
+            'object_id', object_id,
+            'dedup_key', dedup_key,
+            'group_count', group_count
+        )
+        FROM moved
+        ON CONFLICT (id) DO NOTHING
+    )
+    SELECT recipient_id, COUNT(*), COUNT(*) FILTER (WHERE NOT is_read)
+    FROM moved
+    GROUP BY recipient_id
+"""
+
+
+def archive_batch(read_before, any_before, limit):
+    """Одна транзакция — одна пачка. Возвращает число перенесенных строк."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(ARCHIVE_BATCH_SQL, {
+            'read_before': read_before,
+            'any_before': any_before,
+            'limit': limit,
+            'now': timezone.now(),
+        })
+        rows = cursor.fetchall()
+        # Старые непрочитанные тоже уходят (общий срок) — поправляем колокольчик
+        bump_unread({recipient_id: -unread for recipient_id, _, unread in rows})
+    return sum(moved for _, moved, _ in rows)
+
+
+def archive_old_notifications():
+    """
+    Держит горячую таблицу маленькой:
+    прочитанные старше NOTIFICATION_READ_TTL_DAYS и любые старше NOTIFICATION_TTL_DAYS -> архив.
+    Пачками, чтобы не держать долгие блокировки и не раздувать WAL одной транзакцией.
+    """
+    now = timezone.now()
+    read_before = now - timedelta(days=settings.NOTIFICATION_READ_TTL_DAYS)
+    any_before = now - timedelta(days=settings.NOTIFICATION_TTL_DAYS)
+
+    total = 0
+    while True:
+        moved = archive_batch(read_before, any_before, settings.NOTIFICATION_ARCHIVE_BATCH_SIZE)
+        total += moved
+        if moved < settings.NOTIFICATION_ARCHIVE_BATCH_SIZE:
+            return total
@@ -1,3 +1,6 @@
+from zoneinfo import available_timezones
+
+from django.contrib.contenttypes.models import ContentType
 from rest_framework import serializers
 from .models import Notification, NotificationSettings
 
@@ -20,20 +23,25 @@ class NotificationSerializer(serializers.ModelSerializer):
             'created_at_formatted',
             'linked_object',
             'metadata',
+            'group_count',
         ]
 
     def get_linked_object(self, obj):
         """
         Возвращает тип и ID связанного объекта.
         Например: {'type': 'healthevent', 'id': 123}
+        Сам объект не грузим: тип — из кэша ContentType, id — из object_id.
         """
-        if obj.content_object:
-            return {
-                # model_name будет 'healthevent', 'pet' и т.д.
-                'type': obj.content_type.model, 
-                'id': obj.object_id
-            }
-        return None
+        if not obj.content_type_id or not obj.object_id:
+            return None
+        # Если список подгрузил объекты (GenericPrefetch) — удаленный объект не отдаем
+        if Notification.content_object.is_cached(obj) and obj.content_object is None:
+            return None
+        return {
+            # model_name будет 'healthevent', 'pet' и т.д.
+            'type': ContentType.objects.get_for_id(obj.content_type_id).model,
+            'id': obj.object_id
+        }
     
 class NotificationSettingsSerializer(serializers.ModelSerializer):
     class Meta:
@@ -47,5 +55,13 @@ class NotificationSettingsSerializer(serializers.ModelSerializer):
             'notify_care',
             'notify_reproduction',
             'notify_system',
-            'reminder_time_minutes'
-        ]
\ No newline at end of file
+            'reminder_time_minutes',
+            'digest_window_minutes',
+            'timezone'
+        ]
+
+    def validate_timezone(self, value):
+        # Имя уходит в AT TIME ZONE в SQL ежедневных задач — пускаем только известные пояса
+        if value not in available_timezones():
+            raise serializers.ValidationError("Неизвестный часовой пояс")
+        return value
\ No newline at end of file
@@ -1,21 +1,66 @@
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from collections import Counter
+
+from django.utils import timezone
+from .counters import bump_unread
+from .delivery import enqueue_deliveries, get_channels
+from .models import Notification, NotificationDelivery, NotificationSettings
 from .serializers import NotificationSerializer
 
-def send_notification_to_user(notification):
+def insert_notifications(notifications):
+    """
+    INSERT ... ON CONFLICT DO NOTHING по (recipient, dedup_key) вместо проверки exists() перед записью.
+    Возвращает только реально вставленные строки: bulk_create не вызывает post_save
+    и с ignore_conflicts не отдает id, поэтому дочитываем их одним запросом.
+    """
+    if not notifications:
+        return []
+    batch_started = timezone.now()
+    Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+    created = list(Notification.objects.filter(
+        recipient_id__in={n.recipient_id for n in notifications},
+        dedup_key__in={n.dedup_key for n in notifications},
+        created_at__gte=batch_started
+    ))
+    bump_unread(Counter(n.recipient_id for n in created))
+    return created
+
+def send_notifications_bulk(notifications):
+    """
+    Маршрутизация пачки уведомлений (после bulk_create сигналы post_save не срабатывают).
+    Настройки всех получателей грузятся одним запросом, строки доставки пишутся одним bulk_create.
+    """
+    recipient_ids = {n.recipient_id for n in notifications}
+    settings_by_user = {
+        s.user_id: s for s in NotificationSettings.objects.filter(user_id__in=recipient_ids)
+    }
+    deliveries = []
+    for notification in notifications:
+        deliveries += route_notification(notification, settings_by_user.get(notification.recipient_id))
+    enqueue_deliveries(NotificationDelivery.objects.bulk_create(deliveries))
+
+def send_notification_to_user(notification, settings=None):
     """
     Главный маршрутизатор уведомлений.
     Решает, куда отправить уведомление (WS, Push, Email) на основе настроек юзера.
+    Сама отправка — в Celery, в очереди канала: медленный провайдер не тормозит запрос.
     """
-    user = notification.recipient
-    
+    deliveries = route_notification(notification, settings)
+    enqueue_deliveries(NotificationDelivery.objects.bulk_create(deliveries))
+
+def redeliver_notifications(notification_ids):
+    """Повторная отправка уже доставленных уведомлений (обновленный дайджест) теми же каналами."""
+    deliveries = list(NotificationDelivery.objects.filter(notification_id__in=notification_ids))
+    NotificationDelivery.objects.filter(id__in=[d.id for d in deliveries]).update(
+        status='pending', attempts=0, last_error='', sent_at=None, claimed_at=None
+    )
+    enqueue_deliveries(deliveries)
+
+def route_notification(notification, settings=None):
+    """Несохраненные NotificationDelivery для каналов, включенных у получателя."""
     # 1. Получаем настройки (безопасно)
-    try:
-        settings = user.notification_settings
-    except Exception:
+    if settings is None:
         # Если настроек нет, считаем, что все включено (или создаем дефолтные)
-        from .models import NotificationSettings
-        settings, _ = NotificationSettings.objects.get_or_create(user=user)
+        settings, _ = NotificationSettings.objects.get_or_create(user_id=notification.recipient_id)
 
     # 2. Проверка Категорий (Content Filter)
     # Если пользователь отключил "Медицину", мы не должны его беспокоить всплывашками.
@@ -33,44 +78,25 @@ def send_notification_to_user(notification):
 
     # Если категория заглушена пользователем — выходим, не отправляя сигналов
     if not allow_alert:
-        return
-
-    # 3. Маршрутизация по Каналам (Channels)
-    
-    # --- Канал 1: Браузер / Desktop (WebSocket) ---
-    if settings.browser_enabled:
-        send_websocket(notification, settings.sound_enabled)
-
-    # --- Канал 2: Мобильный Пуш (FCM) ---
-    if settings.push_enabled:
-        # Здесь будет вызов функции отправки в Firebase
-        # send_fcm_push(notification)
-        pass
+        return []
 
-    # --- Канал 3: Email ---
-    if settings.email_enabled:
-        # send_email(notification)
-        pass
+    # 3. Маршрутизация по Каналам (settings.NOTIFICATION_CHANNELS: websocket, push, email)
+    return [
+        NotificationDelivery(notification=notification, channel=name)
+        for name, channel in get_channels().items()
+        if channel.is_enabled(settings)
+    ]
 
-def send_websocket(notification, sound_enabled):
-    """Отправка через Django Channels"""
-    channel_layer = get_channel_layer()
-    group_name = f"user_{notification.recipient.id}"
+def websocket_message(notification, sound_enabled):
+    """Сообщение для группы user_<id>"""
+    # Сериализуем данные
+    serializer = NotificationSerializer(notification)
+    data = serializer.data
 
-    try:
-        # Сериализуем данные
-        serializer = NotificationSerializer(notification)
-        data = serializer.data
-        
-        # Добавляем флаг звука (чтобы фронт знал, играть или нет)
-        data['play_sound'] = sound_enabled
+    # Добавляем флаг звука (чтобы фронт знал, играть или нет)
+    data['play_sound'] = sound_enabled
 
-        async_to_sync(channel_layer.group_send)(
-            group_name,
-            {
-                "type": "send_notification",
-                "data": data
-            }
-        )
-    except Exception as e:
-        print(f"Error sending WS notification: {e}")
\ No newline at end of file
+    return {
+        "type": "send_notification",
+        "data": data
+    }
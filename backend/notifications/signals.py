@@ -1,8 +1,12 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from pets.models import PetEvent, PetAccess
+from pets.models import Pet, PetEvent, PetAccess
 from .models import Notification, NotificationSettings
+from .counters import bump_unread
+from .reminders import sync_event_reminders, sync_pet_reminders, sync_user_reminders
 from .services import send_notification_to_user
+from .tasks import fan_out_event_notifications
 
 # === 1. АВТО-НАСТРОЙКИ ДЛЯ НОВЫХ ЮЗЕРОВ ===
 @receiver(post_save, sender='users.User') 
@@ -16,46 +20,10 @@ def create_notification_on_event(sender, instance, created, **kwargs):
     if not created:
         return
 
-    # Собираем получателей
-    recipients = set()
-    if instance.pet.owner:
-        recipients.add(instance.pet.owner)
-    
-    for access in PetAccess.objects.filter(pet=instance.pet, is_active=True):
-        recipients.add(access.user)
-    
-    # Не уведомляем автора о его же действии (опционально, сейчас закомментировано)
-    # if instance.created_by in recipients:
-    #     recipients.remove(instance.created_by)
-
-    if not recipients:
-        return
-
-    # Маппинг категорий
-    category_map = {
-        'medical': 'medical',
-        'reproduction': 'reproduction',
-        'show': 'show',
-        'care': 'care',
-        'other': 'system'
-    }
-    event_cat = instance.event_type.category if instance.event_type else 'other'
-    notif_cat = category_map.get(event_cat, 'system')
-
-    # Создаем уведомления (bulk_create не используем, чтобы сработал сигнал ниже)
-    for user in recipients:
-        Notification.objects.create(
-            recipient=user,
-            category=notif_cat,
-            title=f"Новое событие: {instance.title}",
-            message=f"{instance.pet.name}: {instance.event_type.name if instance.event_type else 'Событие'}",
-            content_object=instance,
-            metadata={
-                "pet_id": instance.pet.id,
-                "event_id": instance.id,
-                "link": f"/dashboard?pet={instance.pet.id}&event={instance.id}" 
-            }
-        )
+    # Рассылка — в Celery и только после коммита: POST события не ждет
+    # ни записи уведомлений, ни Redis, а воркер гарантированно видит событие
+    event_id = instance.id
+    transaction.on_commit(lambda: fan_out_event_notifications.delay(event_id))
 
 # === 3. ОТПРАВКА (МАРШРУТИЗАЦИЯ) ===
 @receiver(post_save, sender=Notification)
@@ -64,4 +32,43 @@ def send_delivery(sender, instance, created, **kwargs):
     Как только уведомление сохранено в БД -> Отдаем Маршрутизатору.
     """
     if created:
-        send_notification_to_user(instance)
\ No newline at end of file
+        if not instance.is_read:
+            bump_unread({instance.recipient_id: 1})
+        send_notification_to_user(instance)
+
+# === 4. ОЧЕРЕДЬ НАПОМИНАНИЙ (ScheduledReminder) ===
+# Пересчет после коммита: воркер не должен увидеть наполовину сохраненное событие.
+# queryset.update() сигналы не шлет — такие места чинит ночной sync_reminder_queue.
+@receiver(post_save, sender=PetEvent)
+def schedule_event_reminders(sender, instance, **kwargs):
+    transaction.on_commit(lambda: sync_event_reminders([instance.id]))
+
+@receiver(post_save, sender=PetAccess)
+@receiver(post_delete, sender=PetAccess)
+def reschedule_on_access_change(sender, instance, **kwargs):
+    transaction.on_commit(lambda: sync_pet_reminders(instance.pet_id))
+
+@receiver(pre_save, sender=Pet)
+def remember_previous_owner(sender, instance, update_fields=None, **kwargs):
+    # Запоминаем владельца до сохранения: очередь пересчитываем, только если он сменился
+    if instance.pk is None or (update_fields is not None and 'owner' not in update_fields):
+        instance._previous_owner_id = instance.owner_id
+        return
+    instance._previous_owner_id = (
+        Pet.objects.filter(pk=instance.pk).values_list('owner_id', flat=True).first()
+    )
+
+@receiver(post_save, sender=Pet)
+def reschedule_on_owner_change(sender, instance, created, **kwargs):
+    # У нового питомца еще нет событий
+    if created or instance.owner_id == getattr(instance, '_previous_owner_id', instance.owner_id):
+        return
+    transaction.on_commit(lambda: sync_pet_reminders(instance.id))
+
+@receiver(post_save, sender=NotificationSettings)
+def reschedule_on_settings_change(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and 'reminder_time_minutes' not in update_fields:
+        return
+    transaction.on_commit(lambda: sync_user_reminders(instance.user_id))
\ No newline at end of file
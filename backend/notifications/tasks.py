@@ -1,125 +1,361 @@
+import logging
+import time
+from datetime import timedelta
+
 from celery import shared_task
+from django.conf import settings
 from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Q
+from django.db import connection, transaction
+from django.contrib.contenttypes.models import ContentType
 from pets.models import PetEvent, PetAccess
-from .models import Notification, NotificationSettings
+from .counters import reconcile_unread_counters
+from .delivery import enqueue_deliveries, get_channel
+from .digest import digest_bucket, upsert_digests
+from .models import Notification, NotificationDelivery, NotificationSettings, ScheduledReminder
+from .reminders import sync_all_reminders
+from .retention import archive_old_notifications
+from .services import insert_notifications, redeliver_notifications, send_notifications_bulk
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def deliver_notifications(channel_name, delivery_ids):
+    """
+    Отправка пачки NotificationDelivery одного канала (очередь notifications.<канал>).
+    Строки забираются короткой транзакцией под SKIP LOCKED и помечаются sending — дубль задачи
+    не отправит то же самое второй раз, а сама отправка идет уже без открытой транзакции.
+    Неудачные возвращаются в pending и перезапускаются с экспоненциальной задержкой,
+    после NOTIFICATION_DELIVERY_MAX_ATTEMPTS — failed. Исключение из send_batch — ошибка всей пачки.
+    """
+    channel = get_channel(channel_name)
+
+    with transaction.atomic():
+        deliveries = list(
+            NotificationDelivery.objects
+            .select_for_update(skip_locked=True, of=('self',))
+            .filter(id__in=delivery_ids, channel=channel_name, status='pending')
+            .select_related('notification__recipient')
+        )
+        if not deliveries:
+            return
+        claimed_at = timezone.now()
+        for delivery in deliveries:
+            delivery.status = 'sending'
+            delivery.attempts += 1
+            delivery.claimed_at = claimed_at
+        NotificationDelivery.objects.bulk_update(deliveries, ['status', 'attempts', 'claimed_at'])
+
+    started = time.monotonic()
+    try:
+        errors = channel.send_batch(deliveries)
+    except Exception as exc:
+        logger.exception("delivery channel=%s batch=%d: send_batch failed", channel_name, len(deliveries))
+        errors = {delivery.id: f"{type(exc).__name__}: {exc}" for delivery in deliveries}
+    elapsed = time.monotonic() - started
+
+    now = timezone.now()
+    retry_ids = []
+    for delivery in deliveries:
+        error = errors.get(delivery.id)
+        delivery.claimed_at = None
+        if error is None:
+            delivery.status = 'sent'
+            delivery.sent_at = now
+            delivery.last_error = ''
+        else:
+            delivery.last_error = error
+            if delivery.attempts >= settings.NOTIFICATION_DELIVERY_MAX_ATTEMPTS:
+                delivery.status = 'failed'
+            else:
+                delivery.status = 'pending'
+                retry_ids.append(delivery.id)
+    NotificationDelivery.objects.bulk_update(deliveries, ['status', 'last_error', 'sent_at', 'claimed_at'])
+
+    # Пропускная способность по каналу видна в логах воркера
+    logger.info(
+        "delivery channel=%s batch=%d sent=%d failed=%d elapsed=%.3fs rate=%.1f/s",
+        channel_name, len(deliveries), len(deliveries) - len(errors), len(errors),
+        elapsed, len(deliveries) / elapsed if elapsed else 0,
+    )
+
+    if retry_ids:
+        attempt = max(d.attempts for d in deliveries if d.id in retry_ids)
+        deliver_notifications.apply_async(
+            (channel_name, retry_ids),
+            queue=settings.NOTIFICATION_CHANNELS[channel_name]['QUEUE'],
+            countdown=settings.NOTIFICATION_DELIVERY_RETRY_DELAY * 2 ** (attempt - 1),
+        )
+
+@shared_task
+def requeue_stalled_deliveries():
+    """
+    Строки, забранные воркером, который так и не записал результат (упал посреди отправки):
+    дольше NOTIFICATION_DELIVERY_CLAIM_TIMEOUT в sending — обратно в pending и в очередь канала.
+    Попытка уже засчитана при захвате.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.NOTIFICATION_DELIVERY_CLAIM_TIMEOUT)
+    with transaction.atomic():
+        stalled = list(
+            NotificationDelivery.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='sending', claimed_at__lt=cutoff)
+            .only('id', 'channel')
+        )
+        if not stalled:
+            return 0
+        NotificationDelivery.objects.filter(id__in=[d.id for d in stalled]).update(
+            status='pending', claimed_at=None, last_error='Воркер не завершил отправку'
+        )
+        enqueue_deliveries(stalled)
+    return len(stalled)
+
+# Категория события -> категория уведомления
+EVENT_CATEGORY_MAP = {
+    'medical': 'medical',
+    'reproduction': 'reproduction',
+    'show': 'show',
+    'care': 'care',
+    'other': 'system'
+}
+
+@shared_task
+def fan_out_event_notifications(event_id):
+    """
+    "Новое событие" всем, кто видит питомца (владелец + активные доступы).
+    Ставится из сигнала через on_commit. Уведомления пишутся пачкой, пуши уходят одной пачкой.
+    События одного питомца и категории сворачиваются в дайджест (см. notifications.digest).
+    dedup_key делает повтор задачи безопасным.
+    """
+    event = PetEvent.objects.select_related('pet', 'event_type').filter(id=event_id).first()
+    if event is None:
+        return
+    # Событие гостевого приема (без карточки питомца) — уведомлять некого
+    if event.pet_id is None:
+        return
+
+    recipients = set(
+        PetAccess.objects.filter(pet_id=event.pet_id, is_active=True).values_list('user_id', flat=True)
+    )
+    if event.pet.owner_id:
+        recipients.add(event.pet.owner_id)
+
+    # Не уведомляем автора о его же действии (опционально, сейчас закомментировано)
+    # recipients.discard(event.created_by_id)
+
+    event_cat = event.event_type.category if event.event_type else 'other'
+    category = EVENT_CATEGORY_MAP.get(event_cat, 'system')
+    event_ct = ContentType.objects.get_for_model(PetEvent)
+    now = timezone.now()
+
+    def build(user_id, dedup_key):
+        return Notification(
+            recipient_id=user_id,
+            category=category,
+            title=f"Новое событие: {event.title}",
+            message=f"{event.pet.name}: {event.event_type.name if event.event_type else 'Событие'}",
+            content_type=event_ct,
+            object_id=event.id,
+            dedup_key=dedup_key,
+            created_at=now,
+            metadata={
+                "pet_id": event.pet_id,
+                "event_id": event.id,
+                "event_ids": [event.id],
+                "link": f"/dashboard?pet={event.pet_id}&event={event.id}"
+            }
+        )
+
+    # Окно группировки у каждого получателя свое (NotificationSettings.digest_window_minutes)
+    default_window = NotificationSettings._meta.get_field('digest_window_minutes').default
+    windows = dict(
+        NotificationSettings.objects.filter(user_id__in=recipients).values_list('user_id', 'digest_window_minutes')
+    )
+    by_window = {}
+    for user_id in recipients:
+        by_window.setdefault(windows.get(user_id, default_window), []).append(user_id)
+
+    # Без группировки — как раньше, по уведомлению на событие
+    immediate = [build(user_id, f'event_created:{event.id}') for user_id in by_window.pop(0, [])]
+    created = insert_notifications(immediate)
+
+    # С группировкой: первое событие окна — новая строка и пуш сразу,
+    # остальные сворачиваются в нее, а итог уходит одним пушем по закрытию окна
+    inserted_ids = []
+    for window, user_ids in by_window.items():
+        bucket_start, bucket_end = digest_bucket(now, window)
+        dedup_key = f'digest:{event.pet_id}:{category}:{int(bucket_start.timestamp())}'
+        inserted, became_digest = upsert_digests(
+            [build(user_id, dedup_key) for user_id in user_ids],
+            digest_title=f"Новые события: {event.pet.name}",
+        )
+        inserted_ids += inserted
+        if became_digest:
+            flush_notification_digests.apply_async((became_digest,), eta=bucket_end)
+
+    if inserted_ids:
+        created += list(Notification.objects.filter(id__in=inserted_ids))
+    send_notifications_bulk(created)
+
+@shared_task
+def flush_notification_digests(notification_ids):
+    """
+    Закрытие окна группировки: свернутые уведомления повторно проходят через доставку
+    (те же строки NotificationDelivery возвращаются в pending) — один пуш на окно.
+    """
+    redeliver_notifications(notification_ids)
 
 @shared_task
 def send_flexible_reminders():
     """
     Умная рассылка напоминаний.
-    Запускается каждую минуту. 
-    Проверяет настройки пользователей и шлет уведомления в нужное время.
+    Запускается каждую минуту, но окна "ровно m минут до события" больше нет:
+    забираем из очереди ScheduledReminder все строки с fire_at <= now, сколько бы
+    тиков ни пропустил beat. Несколько воркеров делят очередь через SKIP LOCKED.
+    """
+    while True:
+        created = _fire_reminder_batch(settings.REMINDER_BATCH_SIZE)
+        if created is None:
+            break
+        # Доставка — после коммита, чтобы не держать блокировки на время отправки
+        send_notifications_bulk(created)
+
+def _fire_reminder_batch(batch_size):
+    """
+    Забирает пачку созревших напоминаний, создает уведомления и помечает строки отправленными —
+    все в одной транзакции. None — очередь пуста.
     """
     now = timezone.now()
-    
-    # 1. Получаем уникальные настройки времени (например: 15, 60, 1440 минут), 
-    # которые реально используют активные пользователи.
-    active_times = NotificationSettings.objects.values_list('reminder_time_minutes', flat=True).distinct()
-
-    for minutes in active_times:
-        # Определяем "окно" времени события
-        # Ищем события, которые начнутся через `minutes` (с погрешностью 1 минута, т.к. таск ежеминутный)
-        target_time_start = now + timedelta(minutes=minutes)
-        target_time_end = target_time_start + timedelta(minutes=1)
-
-        # 2. Ищем запланированные события в этом окне
-        events = PetEvent.objects.filter(
-            date__range=(target_time_start, target_time_end),
-            status='planned'
-        ).select_related('pet__owner', 'event_type')
-
-        for event in events:
-            # 3. Собираем потенциальных получателей для этого события
-            candidates = set()
-            if event.pet.owner:
-                candidates.add(event.pet.owner)
-            
-            for grant in PetAccess.objects.filter(pet=event.pet, is_active=True):
-                candidates.add(grant.user)
-
-            # 4. Фильтруем и отправляем
-            for user in candidates:
-                # А. Проверяем, есть ли у юзера настройки (создаем, если нет)
-                settings, _ = NotificationSettings.objects.get_or_create(user=user)
-
-                # Б. Проверяем, хочет ли он уведомление ИМЕННО ЗА ЭТО время
-                if settings.reminder_time_minutes != minutes:
-                    continue
-                
-                # В. Проверяем, включена ли эта категорию (медицина/уход/etc)
-                # Тут можно добавить маппинг категорий события на настройки
-                # Пока для MVP проверяем глобально: если это мед. событие, а юзер отключил медицину - скипаем
-                # (Логику маппинга можно расширить позже)
-
-                # Г. Проверка на дубликаты (чтобы не спамить, если таск наложился)
-                already_sent = Notification.objects.filter(
-                    recipient=user,
-                    object_id=event.id,
-                    content_type__model='petevent',
-                    metadata__trigger=f'timer_{minutes}' # Уникальная метка триггера
-                ).exists()
-
-                if already_sent:
-                    continue
-
-                # Д. Создаем уведомление
-                Notification.objects.create(
-                    recipient=user,
-                    category='reminder',
-                    title=f"Напоминание: {event.title}",
-                    message=f"Через {minutes} мин.: {event.event_type.name} для {event.pet.name}",
-                    content_object=event,
-                    metadata={
-                        "event_date": str(event.date),
-                        "trigger": f'timer_{minutes}', # Важно для дедупликации
-                        "link": f"/dashboard?pet={event.pet.id}&event={event.id}" # Ссылка для фронта
-                    }
-                )
+    with transaction.atomic():
+        batch = list(
+            ScheduledReminder.objects
+            .select_for_update(skip_locked=True, of=('self',))
+            .filter(sent_at__isnull=True, fire_at__lte=now)
+            .select_related('event__pet', 'event__event_type')
+            .order_by('fire_at')[:batch_size]
+        )
+        if not batch:
+            return None
+
+        event_ct = ContentType.objects.get_for_model(PetEvent)
+        notifications = [
+            Notification(
+                recipient_id=reminder.user_id,
+                category='reminder',
+                title=f"Напоминание: {reminder.event.title}",
+                message=f"Через {reminder.minutes} мин.: {reminder.event.event_type.name} для {reminder.event.pet.name}",
+                content_type=event_ct,
+                object_id=reminder.event_id,
+                dedup_key=f'timer_{reminder.minutes}:{reminder.event_id}:{int(reminder.fire_at.timestamp())}',
+                metadata={
+                    "event_date": str(reminder.event.date),
+                    "trigger": f'timer_{reminder.minutes}',
+                    "link": f"/dashboard?pet={reminder.event.pet_id}&event={reminder.event_id}" # Ссылка для фронта
+                }
+            )
+            for reminder in batch
+            # Событие уже прошло или отменено (долгий простой) — строку просто закрываем
+            if reminder.event.status == 'planned' and reminder.event.date > now
+        ]
+
+        created = insert_notifications(notifications)
+        ScheduledReminder.objects.filter(id__in=[r.id for r in batch]).update(sent_at=now)
+        return created
+
+@shared_task
+def sync_unread_counters():
+    """Ночная сверка счетчиков непрочитанных с таблицей (страховка от рассинхрона)."""
+    reconcile_unread_counters()
+
+@shared_task
+def archive_notifications():
+    """Ночной перенос старых уведомлений в NotificationArchive (сроки — в settings)."""
+    moved = archive_old_notifications()
+    logger.info("notifications archived=%d", moved)
+
+@shared_task
+def sync_reminder_queue():
+    """
+    Ночная сверка очереди напоминаний с событиями.
+    Подбирает изменения, прошедшие мимо сигналов (queryset.update, правки в админке БД).
+    """
+    sync_all_reminders()
+
+# Повторы "на сегодня" одним запросом: next_date попадает в местную дату получателя,
+# у получателя уже наступило REPEAT_ALERT_HOUR, и повтор еще не запланирован (нет более позднего
+# события того же типа у питомца). Окно ±38 ч покрывает все часовые пояса и идет по индексу.
+DUE_REPEATS_SQL = """
+    WITH due AS (
+        SELECT e.id, e.title, e.pet_id, e.event_type_id, e.next_date
+        FROM pets_petevent e
+        WHERE e.next_date >= %(now)s - INTERVAL '38 hours'
+          AND e.next_date < %(now)s + INTERVAL '38 hours'
+          AND NOT EXISTS (
+              SELECT 1 FROM pets_petevent x
+              WHERE x.pet_id = e.pet_id AND x.event_type_id = e.event_type_id
+                AND x.date > e.date AND x.id <> e.id
+          )
+    ),
+    recipients AS (
+        SELECT p.id AS pet_id, p.owner_id AS user_id
+        FROM pets_pet p
+        WHERE p.owner_id IS NOT NULL AND p.id IN (SELECT pet_id FROM due)
+        UNION
+        SELECT a.pet_id, a.user_id
+        FROM pets_petaccess a
+        WHERE a.is_active AND a.pet_id IN (SELECT pet_id FROM due)
+    )
+    SELECT d.id, d.title, t.name, r.user_id, local.now_local::date
+    FROM due d
+    JOIN pets_eventtype t ON t.id = d.event_type_id
+    JOIN recipients r ON r.pet_id = d.pet_id
+    LEFT JOIN notifications_notificationsettings s ON s.user_id = r.user_id
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(s.timezone, %(default_tz)s) AS tz,
+               %(now)s AT TIME ZONE COALESCE(s.timezone, %(default_tz)s) AS now_local
+    ) local
+    WHERE (d.next_date AT TIME ZONE local.tz)::date = local.now_local::date
+      AND EXTRACT(HOUR FROM local.now_local) >= %(alert_hour)s
+"""
 
 @shared_task
 def process_repeating_events():
     """
     Обработка поля `next_date`.
-    Запускается раз в сутки (например, в 09:00 утра).
-    Ищет события, у которых сегодня `next_date`, и напоминает создать новое.
+    Запускается каждый час: у каждого получателя напоминание приходит в его местное утро
+    (REPEAT_ALERT_HOUR по NotificationSettings.timezone), один раз за его местные сутки.
+    Кнопка ведет на /api/events/{id}/duplicate/ — повтор создается в одно касание.
     """
-    now = timezone.now()
-    start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_of_day = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-    # Ищем события, у которых next_date попадает в сегодня
-    events_to_repeat = PetEvent.objects.filter(
-        next_date__range=(start_of_day, end_of_day)
-    ).select_related('pet__owner', 'event_type')
-
-    for event in events_to_repeat:
-        recipients = set()
-        if event.pet.owner: recipients.add(event.pet.owner)
-        for grant in PetAccess.objects.filter(pet=event.pet, is_active=True):
-            recipients.add(grant.user)
-
-        for user in recipients:
-             # Проверка дублей (один раз в день)
-            trigger_id = f'repeat_{event.id}_{now.date()}'
-            if Notification.objects.filter(recipient=user, metadata__trigger=trigger_id).exists():
-                continue
-
-            Notification.objects.create(
-                recipient=user,
-                category='action', # Требует действия
-                title="Подошел срок повтора",
-                message=f"Сегодня нужно повторить процедуру: {event.event_type.name} ({event.title}). Нажмите, чтобы запланировать.",
-                content_object=event,
-                metadata={
-                    "trigger": trigger_id,
-                    "is_repeat_alert": True,
-                    "actions": [{
-                        "label": "Запланировать сейчас",
-                        "api_call": f"/api/events/{event.id}/duplicate/", # Эндпоинт нужно будет реализовать
-                        "type": "button",
-                        "style": "primary"
-                    }]
-                }
-            )
\ No newline at end of file
+    with connection.cursor() as cursor:
+        cursor.execute(DUE_REPEATS_SQL, {
+            'now': timezone.now(),
+            'default_tz': settings.TIME_ZONE,
+            'alert_hour': settings.REPEAT_ALERT_HOUR,
+        })
+        rows = cursor.fetchall()
+
+    event_ct = ContentType.objects.get_for_model(PetEvent)
+    notifications = []
+    for event_id, title, type_name, user_id, local_date in rows:
+        # Один раз в местные сутки: повторный запуск упрется в уникальный (recipient, dedup_key)
+        trigger_id = f'repeat_{event_id}_{local_date}'
+        notifications.append(Notification(
+            recipient_id=user_id,
+            category='action', # Требует действия
+            title="Подошел срок повтора",
+            message=f"Сегодня нужно повторить процедуру: {type_name} ({title}). Нажмите, чтобы запланировать.",
+            content_type=event_ct,
+            object_id=event_id,
+            dedup_key=trigger_id,
+            metadata={
+                "trigger": trigger_id,
+                "is_repeat_alert": True,
+                "actions": [{
+                    "label": "Запланировать сейчас",
+                    "api_call": f"/api/events/{event_id}/duplicate/",
+                    "type": "button",
+                    "style": "primary"
+                }]
+            }
+        ))
+
+    send_notifications_bulk(insert_notifications(notifications))
@@ -1,10 +1,19 @@
 from rest_framework import viewsets, permissions, status, mixins
+from django.contrib.contenttypes.prefetch import GenericPrefetch
 from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
+from pets.models import PetEvent
+from .counters import bump_unread, get_unread_count
 from .models import Notification, NotificationSettings
 from .serializers import NotificationSerializer, NotificationSettingsSerializer
 
 
+class NotificationPagination(CursorPagination):
+    # Keyset по (created_at, id) в пределах получателя: без OFFSET и без полной истории в ответе
+    page_size = 30
+    ordering = ('-created_at', '-id')
+
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API для просмотра уведомлений.
@@ -12,19 +21,26 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
         # Возвращаем только уведомления текущего пользователя
-        return Notification.objects.filter(recipient=self.request.user)
+        queryset = Notification.objects.filter(recipient=self.request.user)
+        if self.action == 'list':
+            # Связанные объекты — одним запросом на тип и только id: нужно лишь знать, что они не удалены
+            queryset = queryset.prefetch_related(
+                GenericPrefetch('content_object', [PetEvent.objects.only('id')])
+            )
+        return queryset
 
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         """
         Возвращает количество непрочитанных уведомлений.
         GET /api/notifications/unread_count/
+        Значение берется из счетчика; дальше клиент получает его по WebSocket ("type": "unread_count").
         """
-        count = self.get_queryset().filter(is_read=False).count()
-        return Response({'count': count})
+        return Response({'count': get_unread_count(request.user.id)})
 
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
@@ -33,9 +49,9 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         POST /api/notifications/{id}/mark_read/
         """
         notification = self.get_object()
-        if not notification.is_read:
-            notification.is_read = True
-            notification.save()
+        # Условный UPDATE: двойной клик не уменьшит счетчик дважды
+        if self.get_queryset().filter(pk=notification.pk, is_read=False).update(is_read=True):
+            bump_unread({request.user.id: -1})
         return Response({'status': 'success'})
 
     @action(detail=False, methods=['post'])
@@ -44,7 +60,8 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         Пометить ВСЕ как прочитанные.
         POST /api/notifications/mark_all_read/
         """
-        self.get_queryset().filter(is_read=False).update(is_read=True)
+        updated = self.get_queryset().filter(is_read=False).update(is_read=True)
+        bump_unread({request.user.id: -updated})
         return Response({'status': 'success'})
     
 class NotificationSettingsViewSet(viewsets.GenericViewSet):
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-19 14:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0006_attribute_attr_type_attribute_options'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='petevent',
+            index=models.Index(fields=['status', 'date'], name='petevent_status_date_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-19 14:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0007_petevent_status_date_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='petevent',
+            index=models.Index(condition=models.Q(('next_date__isnull', False)), fields=['next_date'], name='petevent_next_date_idx'),
+        ),
+    ]
@@ -225,27 +225,44 @@ class Pet(models.Model):
         if self.mother == self or self.father == self:
              raise ValidationError("Питомец не может быть своим собственным родителем.")
 
+    @staticmethod
+    def make_slug(name, tail_length=4):
+        """
+        barsik-a1b2: транслит имени (Барсик -> barsik) + короткий случайный хвост.
+        Если имя состояло из смайликов или спецсимволов и слаг пустой - берем 'pet'.
+        """
+        base_slug = pytils.translit.slugify(name) or 'pet'
+        return f"{base_slug}-{str(uuid.uuid4())[:tail_length]}"
+
+    @classmethod
+    def make_unique_slugs(cls, names):
+        """
+        Слаги для пачки новых карточек (bulk_create не вызывает save):
+        одна проверка на всю пачку, совпавшие перегенерируем с хвостом подлиннее.
+        """
+        slugs = [cls.make_slug(name, 6) for name in names]
+        while True:
+            taken = set(cls.objects.filter(slug__in=slugs).values_list('slug', flat=True))
+            seen = set()
+            clashes = []
+            for i, slug in enumerate(slugs):
+                if slug in taken or slug in seen:
+                    clashes.append(i)
+                seen.add(slug)
+            if not clashes:
+                return slugs
+            for i in clashes:
+                slugs[i] = cls.make_slug(names[i], 8)
+
     def save(self, *args, **kwargs):
         # Если слага еще нет (создание нового питомца)
         if not self.slug:
-            # 1. Сначала транслитерируем имя (Барсик -> barsik)
-            base_slug = pytils.translit.slugify(self.name)
-            
-            # Если имя состояло из смайликов или спецсимволов и слаг пустой - берем 'pet'
-            if not base_slug:
-                base_slug = 'pet'
-            
-            # 2. Генерируем короткий уникальный хвост (4 символа)
-            unique_tail = str(uuid.uuid4())[:4]
-            
-            # 3. Собираем итоговый слаг: barsik-a1b2
-            self.slug = f"{base_slug}-{unique_tail}"
+            self.slug = self.make_slug(self.name)
             
-            # 4. (Параноидальная проверка) На случай, если хвост совпал (шанс 1 на миллион)
+            # (Параноидальная проверка) На случай, если хвост совпал (шанс 1 на миллион)
             # Если такой слаг уже есть в БД — перегенерируем хвост подлиннее
             while Pet.objects.filter(slug=self.slug).exists():
-                unique_tail = str(uuid.uuid4())[:6]
-                self.slug = f"{base_slug}-{unique_tail}"
+                self.slug = self.make_slug(self.name, 6)
         
         super().save(*args, **kwargs)
 
@@ -401,6 +418,12 @@ class PetEvent(models.Model): # Бывший HealthEvent
         verbose_name = "Событие питомца"
         verbose_name_plural = "События питомца"
         ordering = ['-date']
+        indexes = [
+            # Планировщик напоминаний выбирает planned-события по окну дат
+            models.Index(fields=['status', 'date'], name='petevent_status_date_idx'),
+            # Ежечасный поиск повторов по next_date
+            models.Index(fields=['next_date'], name='petevent_next_date_idx', condition=models.Q(next_date__isnull=False)),
+        ]
 
     def __str__(self):
         return f"{self.event_type.name}: {self.title} ({self.pet.name})"
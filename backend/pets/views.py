@@ -11,6 +11,8 @@ from django.db.models import Q, Case, When, IntegerField, Count
 from django.db import connection
 from django.core import signing
 from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 
 from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
@@ -272,6 +274,42 @@ class PetEventViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    @action(detail=True, methods=['post'])
+    def duplicate(self, request, pk=None):
+        """
+        Запланировать повтор события в одно касание (кнопка из уведомления "Подошел срок повтора").
+        POST /api/events/{id}/duplicate/  {"date": "..."} — необязательно, по умолчанию next_date источника.
+        Новое событие наследует интервал повтора: next_date = date + (next_date - date) источника.
+        """
+        source = self.get_object()
+
+        date = source.next_date or timezone.now()
+        if request.data.get('date'):
+            date = parse_datetime(str(request.data['date']))
+            if date is None:
+                return Response({"error": "Неверный формат даты"}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(date):
+                date = timezone.make_aware(date)
+
+        next_date = None
+        if source.next_date and source.next_date > source.date:
+            next_date = date + (source.next_date - source.date)
+
+        event = PetEvent.objects.create(
+            pet_id=source.pet_id,
+            event_type_id=source.event_type_id,
+            title=source.title,
+            description=source.description,
+            data=source.data,
+            date=date,
+            next_date=next_date,
+            status='planned',
+            created_by=request.user,
+        )
+        # pet/event_type уже загружены get_object() — сериализатор не пойдет за ними в БД
+        event.pet, event.event_type = source.pet, source.event_type
+        return Response(self.get_serializer(event).data, status=status.HTTP_201_CREATED)
+
 class PetEventAttachmentViewSet(viewsets.ModelViewSet):
     """
     CRUD для загрузки файлов к событиям.
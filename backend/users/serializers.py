@@ -40,6 +40,12 @@ class UserSerializer(serializers.ModelSerializer):
 
     def get_role(self, obj):
         return "vet" if obj.is_veterinarian else "owner"
+
+    def validate_clinic_name(self, value):
+        # Клиника верифицированного врача дает доступ к счетам коллег — меняет ее только модерация
+        if self.instance and self.instance.is_verified and value != self.instance.clinic_name:
+            raise serializers.ValidationError("Клинику верифицированного врача меняет администратор")
+        return value
     
     def update(self, instance, validated_data):
         password = validated_data.pop('password', None)
@@ -3,6 +3,7 @@
 import React, { useState, useEffect } from 'react';
 import { useRouter } from 'next/navigation'; 
 import NotificationSettingsModal from '@/components/notifications/NotificationsSettingsModal'; 
+import { UNREAD_COUNT_EVENT } from '@/components/providers/NotificationListener';
 import { 
     Bell, 
     Info, 
@@ -60,24 +61,51 @@ export default function NotificationsDropdown({ onClose }: NotificationsDropdown
       });
       if (res.ok) {
         const data = await res.json();
+        // Список отдается курсорными страницами: { next, previous, results }
+        const items: Notification[] = Array.isArray(data) ? data : data.results;
         
         // --- 1. СОРТИРОВКА: Самые свежие (с бОльшим ID) выводим на самый верх ---
-        const sortedData = data.sort((a: Notification, b: Notification) => b.id - a.id);
+        const sortedData = items.sort((a: Notification, b: Notification) => b.id - a.id);
         
         setNotifications(sortedData);
-        setUnreadCount(sortedData.filter((n: Notification) => !n.is_read).length);
       }
     } catch (error) {
       console.error("Error fetching notifications:", error);
     }
   };
 
+  // Счетчик — с сервера, а не по первой странице списка (в ней только последние 30)
+  const fetchUnreadCount = async () => {
+    const token = localStorage.getItem('access_token');
+    if (!token) return;
+
+    try {
+      const res = await fetch(`${API_URL}/api/notifications/unread_count/`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      if (res.ok) {
+        const data = await res.json();
+        setUnreadCount(data.count);
+      }
+    } catch (error) {
+      console.error("Error fetching unread count:", error);
+    }
+  };
+
   useEffect(() => {
     fetchNotifications();
+    fetchUnreadCount();
     const interval = setInterval(fetchNotifications, 60000);
     return () => clearInterval(interval);
   }, []);
 
+  // Счетчик, который сервер пушит по WebSocket (см. NotificationListener)
+  useEffect(() => {
+    const onUnreadCount = (e: Event) => setUnreadCount((e as CustomEvent<number>).detail);
+    window.addEventListener(UNREAD_COUNT_EVENT, onUnreadCount);
+    return () => window.removeEventListener(UNREAD_COUNT_EVENT, onUnreadCount);
+  }, []);
+
   const markAsRead = async (id: number) => {
     const token = localStorage.getItem('access_token');
     setNotifications(prev => prev.map(n => n.id === id ? { ...n, is_read: true } : n));
@@ -101,6 +129,7 @@ export default function NotificationsDropdown({ onClose }: NotificationsDropdown
             method: 'POST',
             headers: { Authorization: `Bearer ${token}` }
         });
+        setUnreadCount(0);
         await fetchNotifications();
       } finally {
           setLoading(false);
@@ -113,11 +142,7 @@ export default function NotificationsDropdown({ onClose }: NotificationsDropdown
       const token = localStorage.getItem('access_token');
       
       // Оптимистичное удаление из списка мгновенно
-      setNotifications(prev => {
-          const nextList = prev.filter(n => n.id !== id);
-          setUnreadCount(nextList.filter(n => !n.is_read).length);
-          return nextList;
-      });
+      setNotifications(prev => prev.filter(n => n.id !== id));
 
       try {
           // Отправляем запрос на удаление в БД
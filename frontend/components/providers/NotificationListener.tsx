@@ -9,6 +9,10 @@ import { addToast } from "@heroui/toast";
 
 const WS_URL = process.env.NEXT_PUBLIC_WS_URL || 'ws://127.0.0.1:8000';
 
+// Сервер шлет новое значение счетчика непрочитанных кадром {"type": "unread_count", "count": N}.
+// Колокольчик (NotificationsDropdown) слушает это событие на window.
+export const UNREAD_COUNT_EVENT = 'notifications:unread_count';
+
 const getToastColor = (category: string) => {
     switch (category) {
         case 'medical': return 'primary';
@@ -56,6 +60,12 @@ export default function NotificationListener() {
         socket.onmessage = (event) => {
             try {
                 const data = JSON.parse(event.data);
+
+                // 0. СЧЕТЧИК: служебный кадр, не уведомление — тост не показываем
+                if (data.type === 'unread_count') {
+                    window.dispatchEvent(new CustomEvent(UNREAD_COUNT_EVENT, { detail: data.count }));
+                    return;
+                }
                 
                 // 1. ЗВУК (Если сервер прислал флаг play_sound=true)
                 if (data.play_sound) {